@@ -0,0 +1,330 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+import asyncio
+import functools
+import itertools
+import logging
+import math
+import metrics
+import os
+import pickle
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    A `ttl` of 0 or less disables expiry; a `maxsize` of 0 disables the cache.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, self._MISSING)
+            if entry is self._MISSING:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl > 0 else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+MISSING = object()
+
+
+class MemoryBackend:
+
+    """Response cache storage inside this process, built on LRUCache.
+
+    Invalidations only reach this process, so deployments with several app
+    processes should use RedisBackend.
+    """
+
+    # Calls never wait on I/O, so the event loop may make them directly
+    blocking = False
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60):
+        self._entries = LRUCache(maxsize, ttl)
+        # Bounded like the entries. A scope seen for the first time, or again
+        # after its generation was evicted, gets a value never used before, so
+        # an eviction can only orphan old entries and never bring them back.
+        self._generations = LRUCache(maxsize)
+        self._next_generation = itertools.count(1)
+        self._lock = Lock()
+
+    def get(self, key: str) -> Any:
+        return self._entries.get(key, MISSING)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries.set(key, value, ttl)
+
+    def generation(self, scope: str) -> int:
+        with self._lock:
+            generation = self._generations.get(scope)
+            if generation is None:
+                generation = next(self._next_generation)
+                self._generations.set(scope, generation)
+            return generation
+
+    def invalidate(self, scope: str) -> None:
+        with self._lock:
+            self._generations.set(scope, next(self._next_generation))
+
+
+class RedisBackend:
+
+    """Response cache storage shared by every app process through Redis.
+
+    `client` can be any redis-py compatible client, e.g. fakeredis in tests.
+    """
+
+    blocking = True
+
+    def __init__(self, url: Optional[str] = None, client=None, prefix: str = "taskcache:"):
+        if client is None:
+            # Optional dependency, only needed when this backend is selected
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Any:
+        data = self.client.get(self.prefix + key)
+        return MISSING if data is None else pickle.loads(data)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, math.ceil(ttl)))
+
+    def generation(self, scope: str) -> int:
+        return int(self.client.get(f"{self.prefix}gen:{scope}") or 0)
+
+    def invalidate(self, scope: str) -> None:
+        self.client.incr(f"{self.prefix}gen:{scope}")
+
+
+class ResponseCache:
+
+    """Caches computed per-user results with TTLs, invalidation and single-flight.
+
+    Keys embed the user's task version when the caller supplies it, so a
+    write in any process retires every entry computed before it. They also
+    embed a per-user generation; invalidating a user bumps it, which orphans
+    all of their entries at once in this process (or everywhere with Redis). Concurrent misses on one key in
+    this process wait for a single computation instead of all running it.
+    Backend failures are counted and fall through to computing the value.
+    """
+
+    def __init__(self, backend=None, ttl: float = 60):
+        self.backend = backend
+        self.ttl = ttl
+        self._flights = {}
+        self._flights_lock = Lock()
+        self._async_flights = {}
+
+    def get_or_compute(self, name: str, user_id: int, args: Hashable,
+                       compute: Callable[[], Any], ttl: Optional[float] = None,
+                       version: Optional[Callable[[], int]] = None) -> Any:
+        if self.backend is None:
+            return compute()
+
+        try:
+            data_version = version() if version is not None else ""
+            key = (f"{name}:{user_id}:{self.backend.generation(str(user_id))}:"
+                   f"{data_version}:{args!r}")
+            value = self.backend.get(key)
+        except Exception as e:
+            metrics.counter("cache_errors").inc()
+            logger.error(f"Response cache lookup failed: {e}")
+            return compute()
+
+        if value is not MISSING:
+            metrics.counter(f"cache_{name}_hits").inc()
+            return value
+
+        with self._flights_lock:
+            flight = self._flights.setdefault(key, Lock())
+        try:
+            with flight:
+                # Another request may have filled the entry while this one waited
+                value = self.backend.get(key)
+                if value is not MISSING:
+                    metrics.counter(f"cache_{name}_hits").inc()
+                    return value
+
+                metrics.counter(f"cache_{name}_misses").inc()
+                value = compute()
+                self.backend.set(key, value, self.ttl if ttl is None else ttl)
+                return value
+        finally:
+            with self._flights_lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def cached(self, name: str, ttl: Optional[float] = None,
+               version: Optional[Callable[[Any, int], int]] = None):
+
+        """Decorate a method whose first argument is the user id.
+
+        `version(instance, user_id)` returns the user's current data version,
+        which becomes part of the key.
+        """
+
+        def decorator(method):
+            @functools.wraps(method)
+            def wrapper(instance, user_id, *args, **kwargs):
+                return self.get_or_compute(
+                    name, user_id, (args, tuple(sorted(kwargs.items()))),
+                    lambda: method(instance, user_id, *args, **kwargs), ttl,
+                    (lambda: version(instance, user_id)) if version is not None else None
+                )
+            # For call_async, which runs the undecorated method on an AsyncSession
+            wrapper.cache_name, wrapper.cache_ttl, wrapper.cache_version = name, ttl, version
+            return wrapper
+        return decorator
+
+    async def _backend_call(self, function: Callable, *args) -> Any:
+        if getattr(self.backend, "blocking", True):
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+
+    async def get_or_compute_async(self, name: str, user_id: int, args: Hashable,
+                                   compute: Callable[[], Awaitable[Any]], ttl: Optional[float] = None,
+                                   version: Optional[Callable[[], Awaitable[int]]] = None) -> Any:
+
+        """get_or_compute() for the event loop, with awaitable `compute` and `version`.
+
+        Concurrent misses wait on an asyncio.Lock: a compute running on an
+        AsyncSession yields to the loop, so a thread lock would block the loop
+        while its holder waits for it.
+        """
+
+        if self.backend is None:
+            return await compute()
+
+        try:
+            data_version = await version() if version is not None else ""
+            generation = await self._backend_call(self.backend.generation, str(user_id))
+            key = f"{name}:{user_id}:{generation}:{data_version}:{args!r}"
+            value = await self._backend_call(self.backend.get, key)
+        except Exception as e:
+            metrics.counter("cache_errors").inc()
+            logger.error(f"Response cache lookup failed: {e}")
+            return await compute()
+
+        if value is not MISSING:
+            metrics.counter(f"cache_{name}_hits").inc()
+            return value
+
+        flight = self._async_flights.setdefault(key, asyncio.Lock())
+        try:
+            async with flight:
+                value = await self._backend_call(self.backend.get, key)
+                if value is not MISSING:
+                    metrics.counter(f"cache_{name}_hits").inc()
+                    return value
+
+                metrics.counter(f"cache_{name}_misses").inc()
+                value = await compute()
+                await self._backend_call(self.backend.set, key, value, self.ttl if ttl is None else ttl)
+                return value
+        finally:
+            if self._async_flights.get(key) is flight:
+                del self._async_flights[key]
+
+    async def call_async(self, db, factory: Callable[[Session], Any], method: Callable,
+                         user_id: int, *args) -> Any:
+
+        """Call `method`, a @cached method of factory(session), through the AsyncSession
+        `db`. Entries are shared with the same call made on a sync Session."""
+
+        def compute():
+            return db.run_sync(lambda session: method.__wrapped__(factory(session), user_id, *args))
+
+        def version():
+            return db.run_sync(lambda session: method.cache_version(factory(session), user_id))
+
+        return await self.get_or_compute_async(method.cache_name, user_id, (args, ()), compute,
+                                               method.cache_ttl,
+                                               version if method.cache_version is not None else None)
+
+    def invalidate(self, user_id: int) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.invalidate(str(user_id))
+        except Exception as e:
+            metrics.counter("cache_errors").inc()
+            logger.error(f"Response cache invalidation failed for user {user_id}: {e}")
+
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+
+
+def _backend_from_env():
+    backend = os.getenv("CACHE_BACKEND", "memory").lower()
+    if backend == "redis":
+        return RedisBackend(os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    if backend == "memory":
+        return MemoryBackend(int(os.getenv("CACHE_MAX_ENTRIES", "10000")), CACHE_TTL_SECONDS)
+    return None
+
+
+response_cache = ResponseCache(_backend_from_env(), CACHE_TTL_SECONDS)
+
+
+def invalidate_on_commit(db: Session, user_ids) -> None:
+
+    """Invalidate the users' cached responses once the session's transaction commits."""
+
+    db.info.setdefault("invalidate_users", set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop("invalidate_users", ()):
+        response_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_invalidations(session):
+    session.info.pop("invalidate_users", None)
@@ -1,16 +1,143 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event, text
+from contextlib import contextmanager
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
 from dotenv import load_dotenv
+from typing import Dict, Optional
+from cache import LRUCache, MISSING, response_cache
+import asyncio
+import metrics
 import os
+import time
 
 load_dotenv()
 
 
+def _asyncpg_url(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
 SQLALCHMEY_DATABASE_URL = os.getenv("SQLALCHMEY_DATABASE_URL")
 
+# Async mode serves the task, user and ops routes from an asyncpg-backed AsyncEngine
+ASYNC_DB = os.getenv("ASYNC_DB", "false").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _asyncpg_url(SQLALCHMEY_DATABASE_URL)
+
+# Connection pool settings. DB_POOL_MODE=null opens a connection per checkout,
+# which is what an external transaction pooler such as PgBouncer expects.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Optional read replica for the read-only listing and analytics routes. A user
+# who wrote within REPLICA_LAG_GRACE_SECONDS keeps reading from the primary so
+# they always see their own writes despite replication lag. With several app
+# processes the write markers are shared through the response cache backend,
+# so CACHE_BACKEND=redis is needed for the guarantee to hold across them.
+READ_REPLICA_URL = os.getenv("READ_REPLICA_URL")
+ASYNC_READ_REPLICA_URL = os.getenv("ASYNC_READ_REPLICA_URL") or _asyncpg_url(READ_REPLICA_URL)
+REPLICA_LAG_GRACE_SECONDS = float(os.getenv("REPLICA_LAG_GRACE_SECONDS", "5"))
+
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class InstrumentedQueuePool(QueuePool):
+
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    metric_name = "db_pool_wait_seconds"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            metrics.counter(f"{self.metric_name}_errors").inc()
+            raise
+        finally:
+            metrics.histogram(self.metric_name, POOL_WAIT_BUCKETS).observe(time.perf_counter() - start)
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+
+    """The same, for an AsyncEngine; checkouts run in its greenlet-adapted sync layer."""
+
+    metric_name = "db_async_pool_wait_seconds"
+
+
+def engine_options(is_async: bool = False, metric_name: str = "db_pool_wait_seconds") -> Dict:
+
+    """Keyword arguments for create_engine / create_async_engine from the pool settings."""
+
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+
+    if DB_POOL_MODE == "null":
+        options["poolclass"] = NullPool
+        if is_async:
+            # Transaction pooling cannot keep asyncpg's prepared statements
+            options["connect_args"] = {"statement_cache_size": 0}
+        return options
+
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    pool_class = InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool
+    options["poolclass"] = type(pool_class.__name__, (pool_class,), {"metric_name": metric_name})
+
+    return options
 
-engine  = create_engine(SQLALCHMEY_DATABASE_URL)
+
+def pool_status(engine) -> Dict:
+
+    """Live statistics of an engine's connection pool."""
+
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"mode": type(pool).__name__}
+
+    return {
+        "mode": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "timeout": DB_POOL_TIMEOUT,
+    }
+
+
+@contextmanager
+def try_advisory_lock(bind, name: str):
+
+    """Try to take a session-level advisory lock named `name`; yields whether it was taken.
+
+    The lock lives on a dedicated autocommit connection for the duration of
+    the block, so it survives the commits of whatever runs inside, and is
+    released by PostgreSQL if this process dies.
+    """
+
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"),
+                                {"name": name}).scalar()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": name})
+
+
+engine  = create_engine(SQLALCHMEY_DATABASE_URL, **engine_options())
 
 SessionLocal =  sessionmaker(autocommit = False ,autoflush = False, bind = engine)
 
@@ -26,3 +153,139 @@ def get_db():
         db.close()
 
 
+read_engine = None
+ReadSessionLocal = SessionLocal
+
+if READ_REPLICA_URL:
+    read_engine = create_engine(READ_REPLICA_URL,
+                                **engine_options(metric_name="db_replica_pool_wait_seconds"))
+    ReadSessionLocal = sessionmaker(autocommit = False ,autoflush = False, bind = read_engine)
+
+
+_recent_writers = LRUCache(maxsize=100000, ttl=REPLICA_LAG_GRACE_SECONDS)
+
+
+def _write_marker(user_id: int) -> str:
+    return f"recent_write:{user_id}"
+
+
+def record_write(user_id: int):
+    _recent_writers.set(user_id, True)
+    if read_engine is None or response_cache.backend is None:
+        return
+    try:
+        response_cache.backend.set(_write_marker(user_id), True, REPLICA_LAG_GRACE_SECONDS)
+    except Exception:
+        metrics.counter("db_write_marker_errors").inc()
+
+
+def recently_wrote(user_id: int) -> bool:
+
+    """Whether the user wrote within the grace period, in this or any other app process."""
+
+    if _recent_writers.get(user_id) is not None:
+        return True
+    if response_cache.backend is None:
+        return False
+    try:
+        return response_cache.backend.get(_write_marker(user_id)) is not MISSING
+    except Exception:
+        # Without the shared marker, the primary is the safe choice
+        metrics.counter("db_write_marker_errors").inc()
+        return True
+
+
+def read_session(user_id: int):
+
+    """Yield a session for read-only work, on the replica unless the user just wrote."""
+
+    if read_engine is not None and not recently_wrote(user_id):
+        db = ReadSessionLocal()
+        metrics.counter("db_reads_replica").inc()
+    else:
+        db = SessionLocal()
+        metrics.counter("db_reads_primary").inc()
+
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Writes are detected on the primary session itself, so every mutation path is
+# covered without the routes having to report them. The authenticated user id
+# is put in session.info by oauth2.get_current_user / get_current_user_async.
+
+@event.listens_for(SessionLocal, "after_flush")
+def _flag_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _flag_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _record_committed_write(session):
+    if session.info.pop("wrote", False) and session.info.get("user_id") is not None:
+        record_write(session.info["user_id"])
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_rolled_back_write(session):
+    session.info.pop("wrote", None)
+
+
+async_engine = None
+AsyncSessionLocal = None
+async_read_engine = None
+AsyncReadSessionLocal = None
+
+if ASYNC_DB:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.orm import Session
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL,
+                                       **engine_options(is_async=True, metric_name="db_async_pool_wait_seconds"))
+
+    class AsyncSyncSession(Session):
+        """The Session behind each AsyncSession, carrying the same write tracking."""
+
+    event.listen(AsyncSyncSession, "after_flush", _flag_flush)
+    event.listen(AsyncSyncSession, "do_orm_execute", _flag_dml)
+    event.listen(AsyncSyncSession, "after_commit", _record_committed_write)
+    event.listen(AsyncSyncSession, "after_rollback", _forget_rolled_back_write)
+
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush = False, expire_on_commit = False,
+                                           sync_session_class = AsyncSyncSession)
+    AsyncReadSessionLocal = AsyncSessionLocal
+
+    if ASYNC_READ_REPLICA_URL:
+        async_read_engine = create_async_engine(ASYNC_READ_REPLICA_URL,
+                                                **engine_options(is_async=True,
+                                                                 metric_name="db_async_replica_pool_wait_seconds"))
+        AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush = False, expire_on_commit = False)
+
+
+async def get_async_db():
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def async_read_session(user_id: int):
+
+    """read_session() for the async routes."""
+
+    # The write marker may be a Redis round trip, which must not block the loop
+    if async_read_engine is not None and not await asyncio.to_thread(recently_wrote, user_id):
+        session_factory = AsyncReadSessionLocal
+        metrics.counter("db_reads_replica").inc()
+    else:
+        session_factory = AsyncSessionLocal
+        metrics.counter("db_reads_primary").inc()
+
+    async with session_factory() as db:
+        yield db
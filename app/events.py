@@ -0,0 +1,178 @@
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+import asyncio
+import json
+import logging
+import os
+import select as select_module
+import threading
+import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+# "memory" fans events out inside this process only; "postgres" sends them
+# through NOTIFY so every app process behind a load balancer receives them.
+TASK_EVENTS_BACKEND = os.getenv("TASK_EVENTS_BACKEND", "memory").lower()
+TASK_EVENTS_CHANNEL = "task_events"
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("TASK_EVENTS_QUEUE_SIZE", "100"))
+
+
+class TaskEventBroadcaster:
+
+    """Delivers task change events to the event-loop queues of a user's subscribers.
+
+    publish() may be called from any thread; delivery is scheduled on the loop
+    that owns each queue. A subscriber that falls behind loses events rather
+    than slowing down the publisher.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, set] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        subscriber = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        subscriber.loop = asyncio.get_running_loop()
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id: int, subscriber: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id: int, payload: Dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(self._deliver, subscriber, payload)
+            except RuntimeError:
+                # The subscriber's loop has already closed
+                self.unsubscribe(user_id, subscriber)
+
+    @staticmethod
+    def _deliver(subscriber: asyncio.Queue, payload: Dict):
+        try:
+            subscriber.put_nowait(payload)
+        except asyncio.QueueFull:
+            metrics.counter("task_events_dropped").inc()
+
+
+broadcaster = TaskEventBroadcaster()
+
+
+def queue_task_events(db: Session, owner_id: int, events: List[Tuple[str, int, Optional[Dict]]]):
+
+    """Emit (event_name, task_id, data) task change events once the session's transaction commits.
+
+    With the postgres backend the events are NOTIFYs issued inside the
+    transaction, which PostgreSQL only delivers on commit. With the memory
+    backend they wait in session.info until the after_commit hook below.
+    """
+
+    payloads = []
+    for event_name, task_id, data in events:
+        payload = {"owner_id": owner_id, "event": event_name, "task_id": task_id}
+        if data:
+            payload["data"] = data
+        payloads.append(payload)
+
+    if not payloads:
+        return
+
+    if TASK_EVENTS_BACKEND == "postgres":
+        # One round trip however many events a bulk write produces
+        db.execute(
+            text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+            {"channel": TASK_EVENTS_CHANNEL,
+             "payloads": [json.dumps(payload, default=str) for payload in payloads]}
+        )
+    else:
+        db.info.setdefault("task_events", []).extend(payloads)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_events(session):
+    for payload in session.info.pop("task_events", ()):
+        broadcaster.publish(payload["owner_id"], payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_events(session):
+    session.info.pop("task_events", None)
+
+
+class PostgresEventListener:
+
+    """LISTENs on the task events channel and hands notifications to the broadcaster."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="task-events-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.error(f"Task event listener failed, reconnecting: {e}")
+                self._stop.wait(1)
+
+    def _listen(self):
+        # A dedicated connection outside the pool, kept in autocommit for LISTEN
+        pooled = self.engine.raw_connection()
+        pooled.detach()
+        conn = pooled.driver_connection
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {TASK_EVENTS_CHANNEL}")
+            while not self._stop.is_set():
+                if select_module.select([conn], [], [], 5) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notification = conn.notifies.pop(0)
+                    payload = json.loads(notification.payload)
+                    broadcaster.publish(payload["owner_id"], payload)
+        finally:
+            conn.close()
+
+
+listener = None
+
+
+def start_listener(engine):
+    global listener
+    if TASK_EVENTS_BACKEND == "postgres" and listener is None:
+        listener = PostgresEventListener(engine)
+        listener.start()
+
+
+def stop_listener():
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
@@ -0,0 +1,216 @@
+"""Check that the analytics, scheduler and notifier queries are served by indexes.
+
+Seeds users and tasks inside a transaction, ANALYZEs them, runs every query
+issued by TaskAnalytics, TaskScheduler and TaskNotifier, and EXPLAINs each one
+with the default planner settings. The seed is large enough per table that a
+per-user query should never be cheaper as a Seq Scan, so exits non-zero if any
+plan contains one outside EXPECTED_SEQ_SCANS. Task timestamps are spread over
+the past months with a small recent slice, as in a live table. The transaction
+is rolled back, so no seed data is left behind. tests/test_explain_queries.py
+runs the same check.
+
+Usage:
+    python explain_queries.py [--users N] [--tasks-per-user N] [--idle-users N]
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from database import engine
+from utils import TaskAnalytics, TaskNotifier, TaskScheduler
+import models
+import stats
+
+
+SEED_USERS = text("""
+    INSERT INTO users (email, password)
+    SELECT 'explain-seed-' || g || '@example.com', '\\x00'::bytea
+    FROM generate_series(1, :users) AS g
+""")
+
+# Most accounts have no tasks due, so users outnumber the task owners; this
+# keeps users at a realistic size next to tasks for the by-key lookups
+SEED_IDLE_USERS = text("""
+    INSERT INTO users (email, password)
+    SELECT 'explain-seed-idle-' || g || '@example.com', '\\x00'::bytea
+    FROM generate_series(1, :users) AS g
+""")
+
+# Due dates span the past three months and the next one. Most past tasks are
+# completed, so pending work is a small part of the table, as in a live one.
+# Tasks were last touched days to months ago, apart from a recent slice on a
+# few owners: the slice is what an incremental replan picks up
+SEED_TASKS = text("""
+    INSERT INTO tasks (name, status, due_date, completed_date, priority, owner_id, updated_at)
+    SELECT 'task ' || g,
+           s.status::task_status,
+           NOW() + d.due_in * INTERVAL '1 day',
+           CASE WHEN s.status = 'completed' THEN NOW() + (d.due_in - g % 5) * INTERVAL '1 day' END,
+           (ARRAY['low', 'medium', 'high'])[1 + g % 3]::task_priority,
+           u.id,
+           CASE WHEN u.id % 100 = 0 AND g % 20 = 0 THEN NOW()
+                ELSE NOW() - (1 + g % 90) * INTERVAL '1 day' END
+    FROM users u
+    CROSS JOIN generate_series(1, :tasks_per_user) AS g
+    CROSS JOIN LATERAL (SELECT g % 120 - 90 AS due_in) d
+    CROSS JOIN LATERAL (SELECT CASE
+        WHEN d.due_in >= 0 THEN (ARRAY['pending', 'in_progress', 'completed'])[1 + g % 3]
+        WHEN g % 25 = 0 THEN 'pending'
+        ELSE 'completed' END AS status) s
+    WHERE u.email LIKE 'explain-seed-%' AND u.email NOT LIKE 'explain-seed-idle-%'
+""")
+
+# A month of replans every five minutes, with a full run each night
+SEED_SCHEDULER_RUNS = text("""
+    INSERT INTO scheduler_runs ("full", watermark, started_at, finished_at)
+    SELECT (g % 288 = 0)::int, ts, ts, ts + INTERVAL '1 second'
+    FROM generate_series(1, 8640) AS g,
+         LATERAL (SELECT NOW() - g * INTERVAL '5 minutes' AS ts) t
+    ORDER BY g DESC
+""")
+
+SEED_TASK_VERSIONS = text("""
+    INSERT INTO task_versions (owner_id, version)
+    SELECT id, 1 FROM users WHERE email LIKE 'explain-seed-%'
+    ON CONFLICT DO NOTHING
+""")
+
+# Tables a call reads whole by design, so a Seq Scan on them is the plan
+EXPECTED_SEQ_SCANS = {
+    # The weekly full replan lists the assignees of every pending task
+    ("TaskScheduler.replan (full)", "tasks"),
+    # The delete queue, drained by every incremental replan
+    ("TaskScheduler.replan (incremental)", "task_schedule_dirty"),
+}
+
+
+def find_seq_scans(plan: Dict) -> List[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name", "?"))
+    for child in plan.get("Plans", []):
+        found.extend(find_seq_scans(child))
+    return found
+
+
+def capture_statements(conn, call: Callable) -> List[Tuple[str, Dict, bool]]:
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            streamed = bool(context.execution_options.get("stream_results"))
+            statements.append((statement, parameters, streamed))
+
+    event.listen(conn, "before_cursor_execute", before_cursor_execute)
+    try:
+        call()
+    finally:
+        event.remove(conn, "before_cursor_execute", before_cursor_execute)
+
+    return statements
+
+
+def check(conn, users: int = 1000, tasks_per_user: int = 200,
+          idle_users: int = 20000) -> List[Tuple[str, str, List[str]]]:
+    """Seed, EXPLAIN and return (call, statement, seq scanned tables) for every
+    captured query. Runs on conn's open transaction; the caller rolls it back."""
+    conn.execute(SEED_USERS, {"users": users})
+    conn.execute(SEED_IDLE_USERS, {"users": idle_users})
+    conn.execute(SEED_TASKS, {"tasks_per_user": tasks_per_user})
+    conn.execute(SEED_SCHEDULER_RUNS)
+    conn.execute(SEED_TASK_VERSIONS)
+
+    user_id, email = conn.execute(text(
+        "SELECT id, email FROM users WHERE email LIKE 'explain-seed-%' ORDER BY id LIMIT 1"
+    )).one()
+    # One batch of the digest sweep's recipient lookup
+    digest_owner_ids = list(conn.execute(text(
+        "SELECT id FROM users WHERE email LIKE 'explain-seed-%' ORDER BY id LIMIT 100"
+    )).scalars())
+
+    db = Session(bind=conn, join_transaction_mode="create_savepoint")
+    try:
+        # The counters and the schedule are derived from the seeded tasks
+        stats.reconcile(db)
+        TaskScheduler(db)._replan(True, 500)
+        for table in ("users", "tasks", "task_stats", "task_schedule", "scheduler_runs", "task_versions"):
+            conn.execute(text(f"ANALYZE {table}"))
+
+        analytics = TaskAnalytics(db)
+        notifier = TaskNotifier(db)
+
+        scheduler = TaskScheduler(db)
+
+        calls = {
+            "TaskAnalytics.get_task_statistics": lambda: analytics.get_task_statistics(user_id),
+            "TaskAnalytics.generate_task_report": lambda: analytics.generate_task_report(user_id),
+            "TaskAnalytics.stream_tasks_csv": lambda: list(analytics.stream_tasks_csv(user_id)),
+            "TaskAnalytics.generate_visualizations": lambda: analytics.generate_visualizations(user_id, "svg"),
+            # The lock-free inner run: the advisory lock needs its own connection
+            "TaskScheduler.replan (full)": lambda: scheduler._replan(True, 500),
+            "TaskScheduler.replan (incremental)": lambda: scheduler._replan(False, 500),
+            "TaskScheduler.schedule_tasks": lambda: scheduler.schedule_tasks(user_id),
+            "TaskNotifier.send_notifications": lambda: notifier.send_notifications(user_id, email),
+            # The sweep streams on a connection of its own, so its query runs here
+            "TaskNotifier.send_daily_digests": lambda: (
+                conn.execute(notifier.daily_digest_query(datetime.now(), 0),
+                             execution_options={"stream_results": True}).close(),
+                notifier.digest_recipients(digest_owner_ids),
+            ),
+        }
+
+        results = []
+        for name, call in calls.items():
+            for statement, parameters, streamed in capture_statements(conn, call):
+                # A streamed query runs from a server-side cursor, which is planned
+                # for its first rows
+                if streamed:
+                    statement = "DECLARE explain_cursor NO SCROLL CURSOR FOR " + statement
+                plan = conn.exec_driver_sql(
+                    "EXPLAIN (FORMAT JSON) " + statement, parameters
+                ).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                seq_scans = [table for table in find_seq_scans(plan[0]["Plan"])
+                             if (name, table) not in EXPECTED_SEQ_SCANS]
+                results.append((name, statement, seq_scans))
+        return results
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tasks-per-user", type=int, default=200)
+    parser.add_argument("--idle-users", type=int, default=20000)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            results = check(conn, args.users, args.tasks_per_user, args.idle_users)
+        finally:
+            trans.rollback()
+
+    failures = 0
+    for name, statement, seq_scans in results:
+        verdict = "FAIL" if seq_scans else "ok"
+        print(f"[{verdict}] {name}: {' '.join(statement.split())[:120]}")
+        if seq_scans:
+            failures += 1
+            print(f"       sequential scan on: {', '.join(seq_scans)}")
+
+    if failures:
+        print(f"{failures} queries fall back to a sequential scan")
+        sys.exit(1)
+    print("All queries use indexes")
+
+
+if __name__ == "__main__":
+    main()
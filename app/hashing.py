@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+import asyncio
+import bcrypt
+import multiprocessing
+import os
+import threading
+
+load_dotenv()
+
+
+# Pool workers unpickle hash_password/verify by module, so this module imports
+# only bcrypt and the standard library and each worker stays small.
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Half the cores, so bcrypt leaves the rest to the event loop and the database driver
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(HASH_POOL_WORKERS * 8)))
+
+
+def hash_password(password : str):
+    return bcrypt.hashpw(password.encode('utf-8'),bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+def verify(plain_pass, hash_pass):
+    return bcrypt.checkpw(plain_pass.encode('utf-8'), hash_pass)
+
+
+class HashQueueFull(Exception):
+    """Raised when too many password hash jobs are already waiting."""
+
+
+_hash_pool = None
+_hash_pending = 0
+_hash_lock = threading.Lock()
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    with _hash_lock:
+        if _hash_pool is None:
+            # Forking a process with live pool connections and threads is unsafe,
+            # so workers start from a clean forkserver (spawn where unavailable)
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _hash_pool = ProcessPoolExecutor(max_workers=HASH_POOL_WORKERS,
+                                             mp_context=multiprocessing.get_context(start_method))
+        return _hash_pool
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    with _hash_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(wait=False, cancel_futures=True)
+            _hash_pool = None
+
+
+async def _run_hash_job(func, *args):
+
+    """Run a bcrypt job in the dedicated process pool, refusing work beyond HASH_QUEUE_LIMIT."""
+
+    global _hash_pending
+    with _hash_lock:
+        if _hash_pending >= HASH_QUEUE_LIMIT:
+            raise HashQueueFull()
+        _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_pool(), func, *args)
+    finally:
+        with _hash_lock:
+            _hash_pending -= 1
+
+
+async def hash_password_async(password : str):
+    return await _run_hash_job(hash_password, password)
+
+async def verify_async(plain_pass, hash_pass):
+    return await _run_hash_job(verify, plain_pass, hash_pass)
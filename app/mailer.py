@@ -0,0 +1,237 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from email.mime.text import MIMEText
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from queue import Queue, Empty
+from typing import Dict, List
+from dotenv import load_dotenv
+from models import EmailOutbox
+import logging
+import metrics
+import os
+import smtplib
+import threading
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+SMTP_CONFIG = {
+    'port': int(os.getenv("SMTP_PORT", "587")),
+    'smtp_server': os.getenv("SMTP_SERVER", "smtp.mailosaur.net"),
+    'starttls': os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes"),
+    'login': os.getenv("USERNAME"),
+    'password': os.getenv("PASSWORD"),
+    'sender_email': os.getenv("SENDER_MAIL")
+}
+
+EMAIL_CONCURRENCY = int(os.getenv("EMAIL_CONCURRENCY", "4"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "100"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "2"))
+# A claimed email is retried after this lease if the worker died mid-send
+EMAIL_LEASE_SECONDS = int(os.getenv("EMAIL_LEASE_SECONDS", "300"))
+# Pooled connections idle for longer than this are checked with NOOP before
+# reuse, since SMTP servers drop clients that stay quiet
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "5"))
+
+
+def enqueue_email(db: Session, recipient: str, subject: str, body: str) -> EmailOutbox:
+
+    """Add an email to the outbox; it is sent once the caller's transaction commits."""
+
+    email = EmailOutbox(recipient=recipient, subject=subject, body=body)
+    db.add(email)
+
+    return email
+
+
+def retry_delay(attempts: int) -> timedelta:
+
+    """Exponential backoff: 30s, 1m, 2m, ... capped at one hour."""
+
+    return timedelta(seconds=min(30 * 2 ** (attempts - 1), 3600))
+
+
+class SMTPConnectionPool:
+
+    """Keeps up to `size` logged-in SMTP connections open for reuse."""
+
+    def __init__(self, config: Dict, size: int):
+        self.config = config
+        self._idle = Queue(maxsize=size)
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.config['smtp_server'], self.config['port'], timeout=30)
+        if self.config['starttls']:
+            server.starttls()
+        if self.config['login']:
+            server.login(self.config['login'], self.config['password'])
+        return server
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            try:
+                server, idle_since = self._idle.get_nowait()
+            except Empty:
+                return self._connect()
+            if time.monotonic() - idle_since < SMTP_IDLE_CHECK_SECONDS or self._alive(server):
+                return server
+            self._discard(server)
+
+    @staticmethod
+    def _alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    @contextmanager
+    def connection(self):
+        server = self._checkout()
+
+        try:
+            yield server
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self._discard(server)
+            raise
+        else:
+            try:
+                self._idle.put_nowait((server, time.monotonic()))
+            except Exception:
+                self._discard(server)
+
+    @staticmethod
+    def _discard(server: smtplib.SMTP):
+        try:
+            server.close()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except Empty:
+                return
+            try:
+                server.quit()
+            except Exception:
+                self._discard(server)
+
+
+class OutboxWorker:
+
+    """Background thread that drains the email outbox with bounded concurrency.
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED, so several app processes can
+    run a worker against the same outbox. A claim pushes next_attempt_at out by
+    a lease, which makes emails claimed by a crashed process eligible again.
+    """
+
+    def __init__(self, session_factory, config: Dict = SMTP_CONFIG,
+                 concurrency: int = EMAIL_CONCURRENCY):
+        self.session_factory = session_factory
+        self.config = config
+        self.smtp_pool = SMTPConnectionPool(config, concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="smtp")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.executor.shutdown(wait=False)
+        self.smtp_pool.close()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                drained = self.drain_once()
+            except Exception as e:
+                logger.error(f"Email outbox worker failed: {e}")
+                drained = 0
+            if drained < EMAIL_BATCH_SIZE:
+                self._wake.wait(EMAIL_POLL_SECONDS)
+                self._wake.clear()
+
+    def drain_once(self) -> int:
+
+        """Claim one batch of due emails, send them concurrently and record the results."""
+
+        with self.session_factory() as db:
+            claimed = db.execute(text("""
+                UPDATE email_outbox
+                SET next_attempt_at = NOW() + make_interval(secs => :lease),
+                    attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM email_outbox
+                    WHERE status = 'pending' AND next_attempt_at <= NOW()
+                    ORDER BY next_attempt_at
+                    LIMIT :batch
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, recipient, subject, body, attempts
+            """), {"lease": EMAIL_LEASE_SECONDS, "batch": EMAIL_BATCH_SIZE}).all()
+            db.commit()
+
+            if not claimed:
+                return 0
+
+            results = list(self.executor.map(self._send, claimed))
+            self._record(db, claimed, results)
+
+        return len(claimed)
+
+    def _send(self, email):
+        message = MIMEText(email.body, "plain")
+        message["Subject"] = email.subject
+        message["From"] = self.config['sender_email']
+        message["To"] = email.recipient
+
+        # A pooled connection dropped by the server since its last use fails
+        # before the message is sent; retry once on a fresh connection
+        for retry in (True, False):
+            try:
+                with self.smtp_pool.connection() as server:
+                    server.sendmail(self.config['sender_email'], email.recipient, message.as_string())
+                return None
+            except smtplib.SMTPServerDisconnected as e:
+                if not retry:
+                    return str(e) or type(e).__name__
+            except Exception as e:
+                return str(e) or type(e).__name__
+
+    def _record(self, db: Session, claimed: List, results: List):
+        now = datetime.now()
+        for email, error in zip(claimed, results):
+            if error is None:
+                values = {"status": "sent", "sent_at": now, "last_error": None}
+                metrics.counter("emails_sent").inc()
+            elif email.attempts >= EMAIL_MAX_ATTEMPTS:
+                values = {"status": "failed", "last_error": error}
+                metrics.counter("emails_failed").inc()
+                logger.error(f"Giving up on email {email.id} after {email.attempts} attempts: {error}")
+            else:
+                values = {"next_attempt_at": now + retry_delay(email.attempts), "last_error": error}
+                metrics.counter("emails_retried").inc()
+            db.query(EmailOutbox).filter(EmailOutbox.id == email.id).update(
+                values, synchronize_session=False
+            )
+        db.commit()
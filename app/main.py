@@ -1,10 +1,16 @@
 from fastapi import FastAPI
-from database import engine, SessionLocal
-from utils import TaskNotifier
+from database import engine, SessionLocal, ASYNC_DB, async_engine, async_read_engine
+from utils import TaskNotifier, TaskScheduler
+from hashing import shutdown_hash_pool
+from mailer import OutboxWorker
+from notify import publisher
+import events
 import models
 from apscheduler.schedulers.background import BackgroundScheduler
 import logging
+from datetime import datetime
 from contextlib import asynccontextmanager
+import os
 from routers import ops,user,auth,task
 
 models.Base.metadata.create_all(bind = engine)
@@ -14,12 +20,15 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+SCHEDULE_REPLAN_MINUTES = int(os.getenv("SCHEDULE_REPLAN_MINUTES", "5"))
+
 notification_scheduler = None
+outbox_worker = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
 
-    global notification_scheduler
+    global notification_scheduler, outbox_worker
     try:
         # db = SessionLocal()
 
@@ -28,12 +37,33 @@ async def lifespan(app: FastAPI):
         def send_daily_notifications():
             with SessionLocal() as temp_db:
                 notifier = TaskNotifier(temp_db)
-                notifier.send_notifications()
+                notifier.send_daily_digests()
         
-        notification_scheduler.add_job(send_daily_notifications, 'interval', days = 1)
+        # Also runs at startup: a sweep interrupted by a crash resumes from its
+        # checkpoint, and an already completed one is skipped.
+        notification_scheduler.add_job(send_daily_notifications, 'interval', days = 1,
+                                       next_run_time=datetime.now())
+
+        def replan_schedule(full: bool = False):
+            with SessionLocal() as temp_db:
+                TaskScheduler(temp_db).replan(full=full)
+
+        # Incremental runs only touch assignees whose tasks changed; the daily
+        # full run moves every plan forward with the calendar.
+        notification_scheduler.add_job(replan_schedule, 'interval',
+                                       minutes=SCHEDULE_REPLAN_MINUTES, max_instances=1)
+        notification_scheduler.add_job(replan_schedule, 'interval', days=1,
+                                       kwargs={"full": True}, next_run_time=datetime.now())
         notification_scheduler.start()
         
         logger.info("Background notification scheduler started successfully")
+
+        outbox_worker = OutboxWorker(SessionLocal)
+        outbox_worker.start()
+        logger.info("Email outbox worker started successfully")
+
+        publisher.start()
+        events.start_listener(engine)
         yield
     except Exception as e:
         logger.error(f"Failed to start background scheduler: {e}")
@@ -43,6 +73,16 @@ async def lifespan(app: FastAPI):
         if notification_scheduler:
             notification_scheduler.shutdown(wait=False)
             logger.info("Background scheduler shutdown successfully")
+        if outbox_worker:
+            outbox_worker.stop()
+            logger.info("Email outbox worker shutdown successfully")
+        events.stop_listener()
+        publisher.stop()
+        shutdown_hash_pool()
+        if async_engine is not None:
+            await async_engine.dispose()
+        if async_read_engine is not None:
+            await async_read_engine.dispose()
 
 
 app = FastAPI(
@@ -51,6 +91,13 @@ app = FastAPI(
 )
 
 
+if ASYNC_DB:
+    # Registered first so their routes take precedence over the sync ones
+    from routers import task_async, user_async, ops_async
+    app.include_router(ops_async.router)
+    app.include_router(task_async.router)
+    app.include_router(user_async.router)
+
 app.include_router(ops.router)
 app.include_router(task.router)
 app.include_router(user.router)
@@ -0,0 +1,66 @@
+from threading import Lock
+from typing import Dict, Sequence
+import bisect
+
+
+class Counter:
+
+    """Monotonic in-process counter."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+
+    """Cumulative-bucket histogram of observed values, in the Prometheus style."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets, self.counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets["+Inf"] = self.count
+            return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+_registry = {}
+_registry_lock = Lock()
+
+
+def counter(name: str) -> Counter:
+    with _registry_lock:
+        return _registry.setdefault(name, Counter())
+
+
+def histogram(name: str, buckets: Sequence[float]) -> Histogram:
+    with _registry_lock:
+        return _registry.setdefault(name, Histogram(buckets))
+
+
+def snapshot() -> Dict:
+    with _registry_lock:
+        items = list(_registry.items())
+    return {name: metric.snapshot() for name, metric in items}
@@ -0,0 +1,199 @@
+"""One-off maintenance commands for the task database.
+
+Usage:
+    python migrate.py backfill-defaults [--batch-size N]
+    python migrate.py add-columns
+    python migrate.py convert-enums [--coerce-unknown]
+    python migrate.py create-indexes
+    python migrate.py reconcile-stats [--owner-id ID]
+    python migrate.py check-stats --owner-id ID
+"""
+import argparse
+import logging
+import sys
+from database import SessionLocal, engine
+from sqlalchemy import text
+from utils import Taskutils, TaskAnalytics, TaskScheduler
+import models
+import stats
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def backfill_defaults(args):
+    with SessionLocal() as db:
+        updated = Taskutils(db).backfill_defaults(batch_size=args.batch_size)
+    for column, count in updated.items():
+        logger.info(f"Backfilled {count} rows for tasks.{column}")
+
+
+# Columns added after the first release; create_all does not alter existing tables
+ADD_COLUMNS = [
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT now()",
+]
+
+
+def add_columns(args):
+    with engine.begin() as conn:
+        for statement in ADD_COLUMNS:
+            conn.execute(text(statement))
+            logger.info(f"Applied: {statement}")
+
+
+# Columns moved from free-form strings to native enums: (table, column, type, default)
+ENUM_COLUMNS = [
+    ("tasks", "status", models.TASK_STATUS_TYPE, models.DEFAULT_STATUS),
+    ("tasks", "priority", models.TASK_PRIORITY_TYPE, models.DEFAULT_PRIORITY),
+    ("task_stats", "status", models.TASK_STATUS_TYPE, None),
+    ("task_stats", "priority", models.TASK_PRIORITY_TYPE, None),
+    ("task_schedule", "priority", models.TASK_PRIORITY_TYPE, None),
+]
+# Derived from tasks, so they are emptied and rebuilt rather than converted
+DERIVED_TABLES = ["task_stats", "task_schedule"]
+
+
+def convert_enums(args):
+    # Rewrites each table under an ACCESS EXCLUSIVE lock, so run it in a
+    # maintenance window. The conversion happens in one transaction.
+    with engine.begin() as conn:
+        for enum_type in (models.TASK_STATUS_TYPE, models.TASK_PRIORITY_TYPE):
+            enum_type.create(bind=conn, checkfirst=True)
+
+        partial_indexes = [index for index in models.TaskDB.__table__.indexes
+                           if index.dialect_options["postgresql"]["where"] is not None]
+        converted = False
+        for table, column, enum_type, default in ENUM_COLUMNS:
+            current = conn.execute(text(
+                "SELECT udt_name FROM information_schema.columns "
+                "WHERE table_name = :table AND column_name = :column"
+            ), {"table": table, "column": column}).scalar()
+            if current is None or current == enum_type.name:
+                logger.info(f"{table}.{column} needs no conversion")
+                continue
+
+            if table == "tasks":
+                # Rebuilt by ALTER TYPE, a partial index would keep its predicate
+                # as a text comparison that enum filters no longer match
+                for index in partial_indexes:
+                    index.drop(bind=conn, checkfirst=True)
+
+            if table in DERIVED_TABLES:
+                conn.execute(text(f"DELETE FROM {table}"))
+            else:
+                normalize_column(conn, table, column, enum_type, default, args.coerce_unknown)
+
+            # The text default cannot be cast automatically, so it is re-added afterwards
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} DROP DEFAULT"))
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} "
+                              f"TYPE {enum_type.name} USING {column}::{enum_type.name}"))
+            if default is not None:
+                conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT '{default}'"))
+            logger.info(f"Converted {table}.{column} to {enum_type.name}")
+            converted = True
+
+        for index in partial_indexes:
+            index.create(bind=conn, checkfirst=True)
+
+    if converted:
+        with SessionLocal() as db:
+            written = stats.reconcile(db)
+            logger.info(f"Rebuilt {written} task_stats rows")
+            TaskScheduler(db).replan(full=True)
+
+
+def normalize_column(conn, table: str, column: str, enum_type, default, coerce_unknown: bool):
+    labels = list(enum_type.enums)
+
+    # 'In Progress', ' HIGH' and the like map onto the enum labels
+    normalized = f"lower(replace(replace(trim({column}), ' ', '_'), '-', '_'))"
+    conn.execute(text(f"UPDATE {table} SET {column} = {normalized} "
+                      f"WHERE {column} IS DISTINCT FROM {normalized}"))
+
+    unknown = conn.execute(text(
+        f"SELECT {column}, count(*) FROM {table} "
+        f"WHERE {column} <> ALL(:labels) GROUP BY {column}"
+    ), {"labels": labels}).all()
+    if not unknown:
+        return
+    if not coerce_unknown:
+        raise SystemExit(f"{table}.{column} has values outside {enum_type.name}: "
+                         f"{dict(unknown)}; fix them or pass --coerce-unknown")
+
+    conn.execute(text(f"UPDATE {table} SET {column} = :default WHERE {column} <> ALL(:labels)"),
+                 {"default": default, "labels": labels})
+    logger.info(f"Coerced {sum(count for _, count in unknown)} rows of "
+                f"{table}.{column} to '{default}'")
+
+
+def create_indexes(args):
+    # create_all only adds indexes together with new tables, so existing
+    # deployments pick them up here. CONCURRENTLY avoids blocking writes and
+    # must run outside a transaction.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for index in models.TaskDB.__table__.indexes:
+            index.dialect_options["postgresql"]["concurrently"] = True
+            try:
+                index.create(bind=conn, checkfirst=True)
+            finally:
+                index.dialect_options["postgresql"]["concurrently"] = False
+            logger.info(f"Index {index.name} is in place")
+
+
+def reconcile_stats(args):
+    with SessionLocal() as db:
+        written = stats.reconcile(db, owner_id=args.owner_id)
+    logger.info(f"Rebuilt {written} task_stats rows")
+
+
+def check_stats(args):
+    # Compare the counters with the aggregate computed directly over tasks
+    with SessionLocal() as db:
+        expected = TaskAnalytics(db)._aggregate_tasks(args.owner_id)
+        actual = stats.read_statistics(db, args.owner_id)
+    if expected != actual:
+        logger.error(f"task_stats mismatch for owner {args.owner_id}: "
+                     f"expected {expected}, got {actual}")
+        sys.exit(1)
+    logger.info(f"task_stats match for owner {args.owner_id}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task database maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser("backfill-defaults",
+                                   help="Replace legacy NULL task columns with their defaults")
+    backfill.add_argument("--batch-size", type=int, default=10000)
+    backfill.set_defaults(func=backfill_defaults)
+
+    columns = commands.add_parser("add-columns",
+                                  help="Add columns introduced after the tables were created")
+    columns.set_defaults(func=add_columns)
+
+    enums = commands.add_parser("convert-enums",
+                                help="Convert task status and priority columns to native enums")
+    enums.add_argument("--coerce-unknown", action="store_true",
+                       help="Replace values outside the enum with the column default")
+    enums.set_defaults(func=convert_enums)
+
+    indexes = commands.add_parser("create-indexes",
+                                  help="Create the declared task indexes on an existing database")
+    indexes.set_defaults(func=create_indexes)
+
+    reconcile = commands.add_parser("reconcile-stats",
+                                    help="Rebuild the task_stats counters from the tasks table")
+    reconcile.add_argument("--owner-id", type=int, default=None)
+    reconcile.set_defaults(func=reconcile_stats)
+
+    check = commands.add_parser("check-stats",
+                                help="Compare task_stats with an aggregate over the tasks table")
+    check.add_argument("--owner-id", type=int, required=True)
+    check.set_defaults(func=check_stats)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,39 @@
-from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, ForeignKey
-from sqlalchemy.sql import text
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, LargeBinary, ForeignKey, Index, Float, Text, Date, Enum
+from sqlalchemy.sql import text, func
 from database import Base
 from sqlalchemy.sql.sqltypes import TIMESTAMP
+import enum
+
+
+class TaskStatus(str, enum.Enum):
+    pending = "pending"
+    in_progress = "in_progress"
+    completed = "completed"
+
+
+class TaskPriority(str, enum.Enum):
+    # Declaration order is the sort order of the PostgreSQL enum, so
+    # ORDER BY priority DESC puts high priority first
+    low = "low"
+    medium = "medium"
+    high = "high"
+
+
+# Native PostgreSQL enums: 4 bytes per value instead of a varlena string.
+# Columns hold plain strings in Python; values outside the enum are
+# rejected before they reach the database.
+TASK_STATUS_TYPE = Enum(*[member.value for member in TaskStatus], name="task_status",
+                        validate_strings=True)
+TASK_PRIORITY_TYPE = Enum(*[member.value for member in TaskPriority], name="task_priority",
+                          validate_strings=True)
+
+
+# Defaults applied on write so that reads never have to backfill NULLs
+DEFAULT_DESCRIPTION = "No description"
+DEFAULT_ASSIGNEE = "Unassigned"
+DEFAULT_PRIORITY = TaskPriority.medium.value
+DEFAULT_STATUS = TaskStatus.pending.value
+
 
 class TaskDB(Base):
 
@@ -9,13 +41,55 @@ class TaskDB(Base):
 
     task_id = Column(Integer,primary_key=True, autoincrement=True, nullable=False)
     name = Column(String,nullable=False)
-    description = Column(String,nullable=True)
-    status = Column(String, server_default='pending')
+    description = Column(String,nullable=True, default=DEFAULT_DESCRIPTION, server_default=DEFAULT_DESCRIPTION)
+    status = Column(TASK_STATUS_TYPE, default=DEFAULT_STATUS, server_default=DEFAULT_STATUS)
     due_date = Column(DateTime, server_default = text("NOW() + INTERVAL'7 day'"))
     completed_date = Column(DateTime)
-    assigned_to = Column(String,nullable=True)
-    priority = Column(String,server_default='medium')
+    assigned_to = Column(String,nullable=True, default=DEFAULT_ASSIGNEE, server_default=DEFAULT_ASSIGNEE)
+    priority = Column(TASK_PRIORITY_TYPE, default=DEFAULT_PRIORITY, server_default=DEFAULT_PRIORITY)
     owner_id = Column(Integer,ForeignKey("users.id",ondelete="CASCADE"),nullable=False)
+    updated_at = Column(DateTime, nullable=False, server_default=text('now()'), onupdate=func.now())
+
+    __table_args__ = (
+        # Task listing: keyset pagination and due-date range / overdue filters
+        Index("ix_tasks_owner_due_date", "owner_id", "due_date", "task_id"),
+        # Status filters, completion statistics and per-user notifications
+        Index("ix_tasks_owner_status_due_date", "owner_id", "status", "due_date"),
+        Index("ix_tasks_owner_priority", "owner_id", "priority"),
+        Index("ix_tasks_owner_assigned_to", "owner_id", "assigned_to"),
+        # Scheduler and daily notification sweep over pending tasks only
+        Index("ix_tasks_pending_due_date", "due_date",
+              postgresql_where=text("status = 'pending'")),
+        # Full re-planning lists the assignees that have pending tasks
+        Index("ix_tasks_pending_owner_assignee", "owner_id", "assigned_to",
+              postgresql_where=text("status = 'pending'")),
+        # Incremental re-planning picks up tasks changed since the last run
+        Index("ix_tasks_updated_at", "updated_at"),
+    )
+
+
+class TaskStats(Base):
+
+    """Per-owner task counters, maintained in the same transaction as task writes."""
+
+    __tablename__ = "task_stats"
+
+    owner_id = Column(Integer,ForeignKey("users.id",ondelete="CASCADE"),primary_key=True)
+    status = Column(TASK_STATUS_TYPE,primary_key=True)
+    priority = Column(TASK_PRIORITY_TYPE,primary_key=True)
+    task_count = Column(Integer,nullable=False,server_default=text("0"))
+    completed_count = Column(Integer,nullable=False,server_default=text("0"))
+    completion_seconds = Column(Float,nullable=False,server_default=text("0"))
+
+
+class TaskVersion(Base):
+
+    """Per-owner counter bumped by every task write; HTTP ETags are derived from it."""
+
+    __tablename__ = "task_versions"
+
+    owner_id = Column(Integer,ForeignKey("users.id",ondelete="CASCADE"),primary_key=True)
+    version = Column(BigInteger,nullable=False,server_default=text("0"))
 
 
 class User(Base):
@@ -25,4 +99,97 @@ class User(Base):
     id = Column(Integer,primary_key=True, autoincrement=True, nullable=False)
     email = Column(String, nullable=False,unique=True)
     password = Column(LargeBinary, nullable=False)
-    created_at = Column(TIMESTAMP(timezone = True), nullable=False, server_default=text('now()'))
\ No newline at end of file
+    created_at = Column(TIMESTAMP(timezone = True), nullable=False, server_default=text('now()'))
+
+
+class EmailOutbox(Base):
+
+    """Durable queue of outgoing emails, drained by mailer.OutboxWorker."""
+
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer,primary_key=True, autoincrement=True, nullable=False)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String, nullable=False, server_default='pending')
+    attempts = Column(Integer, nullable=False, server_default=text("0"))
+    next_attempt_at = Column(DateTime, nullable=False, server_default=text('now()'))
+    last_error = Column(String, nullable=True)
+    created_at = Column(TIMESTAMP(timezone = True), nullable=False, server_default=text('now()'))
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_pending_next_attempt", "next_attempt_at",
+              postgresql_where=text("status = 'pending'")),
+    )
+
+
+class NotificationRun(Base):
+
+    """Checkpoint and timings of one daily notification sweep."""
+
+    __tablename__ = "notification_runs"
+
+    id = Column(Integer,primary_key=True, autoincrement=True, nullable=False)
+    run_date = Column(Date, nullable=False, unique=True)
+    status = Column(String, nullable=False, server_default='running')
+    last_owner_id = Column(Integer, nullable=False, server_default=text("0"))
+    users_notified = Column(Integer, nullable=False, server_default=text("0"))
+    tasks_notified = Column(Integer, nullable=False, server_default=text("0"))
+    query_seconds = Column(Float, nullable=False, server_default=text("0"))
+    render_seconds = Column(Float, nullable=False, server_default=text("0"))
+    write_seconds = Column(Float, nullable=False, server_default=text("0"))
+    started_at = Column(DateTime, nullable=False, server_default=text('now()'))
+    finished_at = Column(DateTime, nullable=True)
+
+
+class TaskSchedule(Base):
+
+    """Planned start date of each pending task, maintained by utils.TaskScheduler."""
+
+    __tablename__ = "task_schedule"
+
+    task_id = Column(Integer,ForeignKey("tasks.task_id",ondelete="CASCADE"),primary_key=True)
+    owner_id = Column(Integer,ForeignKey("users.id",ondelete="CASCADE"),nullable=False)
+    assigned_to = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    priority = Column(TASK_PRIORITY_TYPE, nullable=False)
+    due_date = Column(DateTime, nullable=True)
+    suggested_start_date = Column(DateTime, nullable=False)
+    planned_at = Column(DateTime, nullable=False, server_default=text('now()'))
+
+    __table_args__ = (
+        Index("ix_task_schedule_owner_start", "owner_id", "suggested_start_date", "task_id"),
+        Index("ix_task_schedule_owner_assignee", "owner_id", "assigned_to"),
+    )
+
+
+class ScheduleDirtyAssignee(Base):
+
+    """An assignee whose plan lost a pending task to a delete, for the next re-plan.
+
+    A deleted task leaves no row for the incremental run to find: its
+    task_schedule row goes with it through the foreign key cascade.
+    """
+
+    __tablename__ = "task_schedule_dirty"
+
+    owner_id = Column(Integer,ForeignKey("users.id",ondelete="CASCADE"),primary_key=True)
+    assigned_to = Column(String,primary_key=True)
+    marked_at = Column(DateTime, nullable=False, server_default=text('now()'))
+
+
+class SchedulerRun(Base):
+
+    """One re-planning pass; the latest watermark bounds the next incremental run."""
+
+    __tablename__ = "scheduler_runs"
+
+    id = Column(Integer,primary_key=True, autoincrement=True, nullable=False)
+    full = Column(Integer, nullable=False, server_default=text("0"))
+    watermark = Column(DateTime, nullable=False)
+    assignees_planned = Column(Integer, nullable=False, server_default=text("0"))
+    tasks_planned = Column(Integer, nullable=False, server_default=text("0"))
+    started_at = Column(DateTime, nullable=False, server_default=text('now()'))
+    finished_at = Column(DateTime, nullable=True)
@@ -1,12 +1,123 @@
 import pusher
+import logging
+import os
+import queue
+import threading
+import time
+from dotenv import load_dotenv
+import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+pusher_options = {}
+if os.getenv("PUSHER_HOST"):
+  # Point the client at a local fake Pusher server, e.g. for tests
+  pusher_options = {"host": os.getenv("PUSHER_HOST"), "port": int(os.getenv("PUSHER_PORT", "443"))}
 
 pusher_client = pusher.Pusher(
-  app_id='',
-  key='',
-  secret='',
-  cluster='ap2',
-  ssl=True
+  app_id=os.getenv("PUSHER_APP_ID", ''),
+  key=os.getenv("PUSHER_KEY", ''),
+  secret=os.getenv("PUSHER_SECRET", ''),
+  cluster=os.getenv("PUSHER_CLUSTER", 'ap2'),
+  ssl=os.getenv("PUSHER_SSL", "true").lower() in ("1", "true", "yes"),
+  **pusher_options
 )
 
+# Pusher accepts at most 10 events per trigger_batch call
+PUSHER_BATCH_LIMIT = 10
+# Upper bound on events taken from the queue per publish cycle
+PUBLISH_DRAIN_LIMIT = 1000
+
+
+class PusherPublisher:
+
+  """Publishes Pusher events from a background thread instead of the request path.
+
+  Events wait in a bounded queue. The worker drains what is queued, keeps only
+  the latest payload per (channel, event), and sends the result through
+  trigger_batch in groups of 10. When the queue is full the event is dropped
+  and counted, so a Pusher outage never blocks or fails a request. The app
+  lifespan starts the worker once; events published after stop() are dropped.
+  """
+
+  def __init__(self, client, maxsize: int = 10000, linger: float = 0.05):
+    self.client = client
+    self.linger = linger
+    self._queue = queue.Queue(maxsize=maxsize)
+    self._thread = None
+    self._lock = threading.Lock()
+    self._stop = threading.Event()
+
+  def start(self):
+    with self._lock:
+      if self._thread is None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pusher-publisher", daemon=True)
+        self._thread.start()
+
+  def stop(self, timeout: float = 5):
+    self._stop.set()
+    if self._thread is not None:
+      self._thread.join(timeout=timeout)
+      self._thread = None
+
+  def publish(self, channel: str, event: str, message: dict):
+    if self._stop.is_set():
+      metrics.counter("pusher_events_dropped").inc()
+      logger.warning(f"Pusher publisher stopped, dropping event {event!r} on {channel!r}")
+      return
+    try:
+      self._queue.put_nowait((channel, event, message))
+      metrics.counter("pusher_events_queued").inc()
+    except queue.Full:
+      metrics.counter("pusher_events_dropped").inc()
+
+  def _run(self):
+    while not self._stop.is_set() or not self._queue.empty():
+      try:
+        first = self._queue.get(timeout=0.5)
+      except queue.Empty:
+        continue
+
+      # Give bursts a moment to accumulate so they coalesce into fewer calls
+      time.sleep(self.linger)
+      pending = {}
+      drained = 0
+      item = first
+      while item is not None:
+        channel, event, message = item
+        # Re-inserting keeps the event at the position of its latest payload
+        pending.pop((channel, event), None)
+        pending[(channel, event)] = message
+        drained += 1
+        if drained >= PUBLISH_DRAIN_LIMIT:
+          break
+        try:
+          item = self._queue.get_nowait()
+        except queue.Empty:
+          item = None
+
+      metrics.counter("pusher_events_coalesced").inc(drained - len(pending))
+      self._send(pending)
+
+  def _send(self, pending: dict):
+    batch = [{"channel": channel, "name": event, "data": message}
+             for (channel, event), message in pending.items()]
+    for start in range(0, len(batch), PUSHER_BATCH_LIMIT):
+      chunk = batch[start:start + PUSHER_BATCH_LIMIT]
+      try:
+        self.client.trigger_batch(chunk)
+        metrics.counter("pusher_events_sent").inc(len(chunk))
+      except Exception as e:
+        metrics.counter("pusher_errors").inc()
+        logger.error(f"Failed to publish {len(chunk)} Pusher events: {e}")
+
+
+publisher = PusherPublisher(pusher_client,
+                            maxsize=int(os.getenv("PUSHER_QUEUE_SIZE", "10000")))
+
+
 def push_notifications(channel : str, event : str, message : dict):
-  pusher_client.trigger(channel, event, message)
\ No newline at end of file
+  publisher.publish(channel, event, message)
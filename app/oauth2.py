@@ -1,13 +1,19 @@
 from jose import JWTError, jwt
 from datetime import datetime,timedelta
 from schemas import TokenData
-from fastapi import Depends, status, HTTPException
+from fastapi import Depends, status, HTTPException, Request, Response
 from fastapi.security import OAuth2PasswordBearer
 from dotenv import load_dotenv
 import os
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import event
+from typing import NamedTuple
+from database import get_db, get_async_db, read_session, async_read_session
+from cache import LRUCache
+import hashlib
 import models
+import time
+import versions
 
 load_dotenv()
 
@@ -17,6 +23,47 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+# Embed the email in issued tokens so requests can skip the user lookup
+TOKEN_EMBED_CLAIMS = os.getenv("TOKEN_EMBED_CLAIMS", "false").lower() in ("1", "true", "yes")
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+# ETags of time-dependent responses (overdue counts, upcoming tasks) also
+# change at this interval, even when the user's tasks do not
+ETAG_TIME_BUCKET_SECONDS = int(os.getenv("ETAG_TIME_BUCKET_SECONDS", "60"))
+
+
+class Principal(NamedTuple):
+
+    """The authenticated user as seen by the routes."""
+
+    id: int
+    email: str
+
+
+principal_cache = LRUCache(maxsize=PRINCIPAL_CACHE_SIZE if PRINCIPAL_CACHE_TTL > 0 else 0,
+                           ttl=PRINCIPAL_CACHE_TTL)
+
+
+def invalidate_principal(user_id: int):
+    principal_cache.delete(user_id)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_principal(target.id)
+
+
+def token_claims(user) -> dict:
+
+    claims = {"id": user.id}
+    if TOKEN_EMBED_CLAIMS:
+        claims["email"] = user.email
+
+    return claims
+
 
 def create_access_token(data : dict):
 
@@ -41,21 +88,150 @@ def verify_access_token(token : str, credentials_exception):
         if id is None:
             raise credentials_exception
         
-        token_data = TokenData(id=id)
+        token_data = TokenData(id=id, email=payload.get("email"))
     except JWTError:
         raise credentials_exception
 
     return token_data
 
 
+def _credentials_exception():
+
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, 
+                         detail="Could Not Validate Credentials", 
+                         headers= {"WWW-Authenticate" : "Bearer"})
+
+
+def _load_principal(db : Session, user_id : int):
+
+    user = db.query(models.User.id, models.User.email).filter(models.User.id == user_id).first()
+    if user is None:
+        return None
+
+    principal = Principal(id=user.id, email=user.email)
+    principal_cache.set(user_id, principal)
+
+    return principal
+
+
+def _principal_without_db(token):
+
+    # Signed claims are trusted as-is and need no lookup
+    if token.email is not None:
+        return Principal(id=token.id, email=token.email)
+
+    return principal_cache.get(token.id)
+
+
 def get_current_user(token: str = Depends(oauth2_scheme), db : Session = Depends(get_db)):
 
-    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, 
-                                          detail="Could Not Validate Credentials", 
-                                          headers= {"WWW-Authenticate" : "Bearer"})
+    credentials_exception = _credentials_exception()
     
     token = verify_access_token(token, credentials_exception)
 
-    user = db.query(models.User).filter(models.User.id == token.id).first()
+    principal = _principal_without_db(token) or _load_principal(db, token.id)
+    if principal is None:
+        raise credentials_exception
+
+    # Lets the session attribute its commits to this user (see database.read_session)
+    db.info["user_id"] = principal.id
+
+    return principal
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db = Depends(get_async_db)):
+
+    credentials_exception = _credentials_exception()
+
+    token = verify_access_token(token, credentials_exception)
+
+    principal = _principal_without_db(token) or await db.run_sync(_load_principal, token.id)
+    if principal is None:
+        raise credentials_exception
+
+    # AsyncSession.info is the info of its sync Session, where the write tracking runs
+    db.info["user_id"] = principal.id
+
+    return principal
+
+
+def get_read_db(current_user = Depends(get_current_user)):
+
+    """Session for read-only routes: the replica, unless this user wrote moments ago."""
+
+    yield from read_session(current_user.id)
+
+
+async def get_async_read_db(current_user = Depends(get_current_user_async)):
+
+    """get_read_db() for the routes on the async session."""
+
+    async for db in async_read_session(current_user.id):
+        yield db
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    return "*" in candidates or etag in [candidate.removeprefix("W/") for candidate in candidates]
+
+
+def task_etag(time_dependent: bool = False):
+
+    """Dependency for conditional GETs on the current user's task data.
+
+    The ETag is derived from the user's task version, the path and the query
+    parameters. A matching If-None-Match ends the request with a 304 before
+    the route runs any of its queries. Otherwise the ETag headers are set on
+    the response and also returned, for routes that build their own Response.
+    """
+
+    # The version comes from the primary: a lagging replica would answer a
+    # client's own fresh write with a 304 for the data it replaced
+    def dependency(request: Request, response: Response,
+                   db: Session = Depends(get_db),
+                   current_user = Depends(get_current_user)) -> dict:
+        version = versions.current(db, current_user.id)
+        return _conditional_headers(request, response, current_user.id, version, time_dependent)
+
+    return dependency
+
+
+def task_etag_async(time_dependent: bool = False):
+
+    """task_etag() for the routes on the async session."""
+
+    async def dependency(request: Request, response: Response,
+                         db = Depends(get_async_db),
+                         current_user = Depends(get_current_user_async)) -> dict:
+        version = await db.run_sync(lambda session: versions.current(session, current_user.id))
+        return _conditional_headers(request, response, current_user.id, version, time_dependent)
+
+    return dependency
+
+
+def _conditional_headers(request: Request, response: Response, user_id: int,
+                         version: int, time_dependent: bool) -> dict:
+    parts = [str(user_id), str(version), request.url.path,
+             str(sorted(request.query_params.multi_items()))]
+    if time_dependent:
+        parts.append(str(int(time.time() // ETAG_TIME_BUCKET_SECONDS)))
+    etag = '"' + hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32] + '"'
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return headers
+
+
+def get_current_admin(current_user = Depends(get_current_user)):
+
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Admin privileges required")
 
-    return user
\ No newline at end of file
+    return current_user
@@ -0,0 +1,31 @@
+from fastapi.responses import ORJSONResponse
+from dotenv import load_dotenv
+from typing import Any, Dict, Optional
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+# Opt-in: list routes hand their rows straight to orjson, skipping the
+# response_model validation and jsonable_encoder pass over every item.
+# Only for payloads built from trusted database rows.
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+if FAST_JSON_RESPONSES:
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        logger.warning("FAST_JSON_RESPONSES is set but orjson is not installed; using the default serializer")
+        FAST_JSON_RESPONSES = False
+
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Any:
+
+    """Return `content` as an ORJSONResponse on the fast path, unchanged otherwise."""
+
+    if FAST_JSON_RESPONSES:
+        return ORJSONResponse(content, headers=headers)
+    return content
@@ -3,33 +3,42 @@ from database import get_db
 from schemas import Token
 from sqlalchemy.orm import Session
 from models import User
-from utils import verify
-from oauth2 import create_access_token
+from hashing import verify_async, HashQueueFull
+from fastapi.concurrency import run_in_threadpool
+from oauth2 import create_access_token, token_claims
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 
 router = APIRouter(tags=['Auth'], prefix="/login")
 
 @router.post('/', response_model = Token)
-def login(user_cred : OAuth2PasswordRequestForm = Depends(), 
-          db : Session = Depends(get_db)):
+async def login(user_cred : OAuth2PasswordRequestForm = Depends(), 
+                db : Session = Depends(get_db)):
     
     try:
-        user = db.query(User).filter(User.email == user_cred.username).first()
+        user = await run_in_threadpool(
+            lambda: db.query(User).filter(User.email == user_cred.username).first()
+        )
 
         
-        if not user or not verify(user_cred.password, user.password):
+        if not user or not await verify_async(user_cred.password, user.password):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, 
                 detail="Invalid Credentials"
             )
 
+    except HashQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, retry shortly",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, 
             detail="Invalid Credentials"
         )
     
-    access_token = create_access_token(data={"id":user.id})
+    access_token = create_access_token(data=token_claims(user))
 
     return {"access_token" : access_token,
             "token_type" : "bearer"}
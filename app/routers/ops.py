@@ -1,11 +1,13 @@
-from fastapi import Depends, HTTPException, status, APIRouter 
+from fastapi import Depends, HTTPException, status, APIRouter, Query
 from utils import TaskAnalytics, TaskNotifier, TaskScheduler
-from database import get_db
+from database import get_db, engine, async_engine, async_read_engine, pool_status
+import metrics
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import Dict, Optional
+from schemas import NotificationPage, SchedulePage
 import logging
 from fastapi.responses import StreamingResponse
-from oauth2 import get_current_user
+from oauth2 import get_current_user, get_current_admin, get_read_db, task_etag
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,13 +16,18 @@ logger = logging.getLogger(__name__)
 router = APIRouter(tags=["ops"], prefix="/ops")
 
 
-@router.get("/schedule", response_model=List[Dict])
-def schedule_tasks(db: Session = Depends(get_db)):
-    """Schedule pending tasks based on priority and due dates"""
+@router.get("/schedule", response_model=SchedulePage)
+def schedule_tasks(limit: int = Query(100, ge=1, le=1000),
+                   cursor: Optional[str] = None,
+                   db: Session = Depends(get_read_db),
+                   current_user : int = Depends(get_current_user)):
+    """Get the planned start dates of the user's pending tasks"""
     try:
         scheduler = TaskScheduler(db)
-        scheduled_tasks = scheduler.schedule_tasks()
-        return scheduled_tasks
+        scheduled_tasks, next_cursor = scheduler.schedule_tasks(current_user.id, limit, cursor)
+        return {"items": scheduled_tasks, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error scheduling tasks: {e}")
         raise HTTPException(
@@ -28,14 +35,32 @@ def schedule_tasks(db: Session = Depends(get_db)):
             detail="Failed to schedule tasks"
         )
 
-@router.get("/notify", response_model=List[Dict])
-def send_task_notifications(db: Session = Depends(get_db), 
+@router.post("/schedule/replan", response_model=Dict)
+def replan_schedule(full: bool = False,
+                    db: Session = Depends(get_db),
+                    current_admin : int = Depends(get_current_admin)):
+    """Re-plan the task schedule now instead of waiting for the background job"""
+    try:
+        return TaskScheduler(db).replan(full=full)
+    except Exception as e:
+        logger.error(f"Error re-planning task schedule: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to re-plan task schedule"
+        )
+
+@router.get("/notify", response_model=NotificationPage)
+def send_task_notifications(limit: int = Query(100, ge=1, le=1000),
+                            cursor: Optional[str] = None,
+                            db: Session = Depends(get_db), 
                             current_user : int = Depends(get_current_user)):
     """Send notifications for upcoming and overdue tasks"""
     try:
         notifier = TaskNotifier(db)
-        notifications = notifier.send_notifications(current_user.email)
-        return notifications
+        notifications, next_cursor = notifier.send_notifications(current_user.id, current_user.email, limit, cursor)
+        return {"items": notifications, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error sending notifications: {e}")
         raise HTTPException(
@@ -44,8 +69,9 @@ def send_task_notifications(db: Session = Depends(get_db),
         )
 
 @router.get("/statistics", response_model=Dict)
-def get_task_statistics(db: Session = Depends(get_db),
-                        current_user : int = Depends(get_current_user)):
+def get_task_statistics(db: Session = Depends(get_read_db),
+                        current_user : int = Depends(get_current_user),
+                        etag: dict = Depends(task_etag(time_dependent=True))):
     """Get task statistics and analytics"""
     try:
         analytics = TaskAnalytics(db)
@@ -59,8 +85,9 @@ def get_task_statistics(db: Session = Depends(get_db),
         )
 
 @router.get("/report", response_model=Dict)
-def generate_task_report(db: Session = Depends(get_db),
-                         current_user : int = Depends(get_current_user)):
+def generate_task_report(db: Session = Depends(get_read_db),
+                         current_user : int = Depends(get_current_user),
+                         etag: dict = Depends(task_etag(time_dependent=True))):
     """Generate detailed task analysis report"""
     try:
         analytics = TaskAnalytics(db)
@@ -74,26 +101,73 @@ def generate_task_report(db: Session = Depends(get_db),
         )
     
 @router.get("/getcsv")
-def download_csv(db: Session = Depends(get_db),
-                current_user: int = Depends(get_current_user)):
+def download_csv(db: Session = Depends(get_read_db),
+                current_user: int = Depends(get_current_user),
+                etag: dict = Depends(task_etag())):
     """Download tasks as CSV file"""
     analytics = TaskAnalytics(db)
-    _, csv_buffer = analytics.export_tasks_to_csv(current_user.id)
 
     return StreamingResponse(
-        content=csv_buffer,
+        content=analytics.stream_tasks_csv(current_user.id),
         media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=tasks.csv"}
+        headers={"Content-Disposition": "attachment; filename=tasks.csv", **etag}
     )
 
 @router.get("/getviz")
-def get_visualizations(db: Session = Depends(get_db),
-                      current_user: int = Depends(get_current_user)):
+def get_visualizations(format: str = Query("png", pattern="^(png|svg)$"),
+                      db: Session = Depends(get_read_db),
+                      current_user: int = Depends(get_current_user),
+                      etag: dict = Depends(task_etag())):
     """Get task priority distribution visualization"""
     analytics = TaskAnalytics(db)
-    buffer = analytics.generate_visualizations(current_user.id)
+    buffer = analytics.generate_visualizations(current_user.id, format)
 
     return StreamingResponse(
         content=buffer, 
-        media_type="image/png"
+        media_type="image/svg+xml" if format == "svg" else "image/png",
+        headers=etag
+    )
+
+
+def _export_response(analytics: TaskAnalytics, fmt: str, user_id, filename: str):
+    try:
+        content = analytics.export_tasks(fmt, user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ImportError as e:
+        logger.error(f"Export format {fmt} unavailable: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f"Export format {fmt} is not available on this server"
+        )
+
+    return StreamingResponse(
+        content=content,
+        media_type=TaskAnalytics.EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename={filename}.{fmt}"}
     )
+
+@router.get("/export")
+def export_tasks(format: str = Query("parquet", pattern="^(parquet|arrow|ndjson)$"),
+                 db: Session = Depends(get_read_db),
+                 current_user: int = Depends(get_current_user)):
+    """Download tasks as Parquet, Arrow IPC stream or NDJSON"""
+    return _export_response(TaskAnalytics(db), format, current_user.id, "tasks")
+
+@router.get("/export/all")
+def export_all_tasks(format: str = Query("parquet", pattern="^(parquet|arrow|ndjson)$"),
+                     db: Session = Depends(get_db),
+                     current_admin: int = Depends(get_current_admin)):
+    """Download the tasks of every user in one pass (admin only)"""
+    return _export_response(TaskAnalytics(db), format, None, "all_tasks")
+
+@router.get("/metrics", response_model=Dict)
+def get_metrics(current_admin: int = Depends(get_current_admin)):
+    """Connection pool state and in-process counters for monitoring (admin only)"""
+    pools = {"primary": pool_status(engine)}
+    if async_engine is not None:
+        pools["async"] = pool_status(async_engine.sync_engine)
+    if async_read_engine is not None:
+        pools["async_replica"] = pool_status(async_read_engine.sync_engine)
+
+    return {"pools": pools, "metrics": metrics.snapshot()}
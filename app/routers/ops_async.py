@@ -0,0 +1,121 @@
+from fastapi import Depends, HTTPException, status, APIRouter, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils import TaskAnalytics, TaskNotifier, TaskScheduler, task_version
+from database import get_async_db
+from cache import response_cache
+from typing import Dict, Optional
+from schemas import NotificationPage, SchedulePage
+from io import BytesIO
+import logging
+from oauth2 import get_current_user_async, get_async_read_db, task_etag_async
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Async variants of the per-user ops read routes, mounted ahead of the sync
+# router when ASYNC_DB is enabled. Cached results go through
+# response_cache.call_async, whose single-flight waits on the event loop
+# instead of a thread lock, and share their entries with the sync routes.
+router = APIRouter(tags=["ops"], prefix="/ops")
+
+
+@router.get("/schedule", response_model=SchedulePage)
+async def schedule_tasks(limit: int = Query(100, ge=1, le=1000),
+                         cursor: Optional[str] = None,
+                         db: AsyncSession = Depends(get_async_read_db),
+                         current_user : int = Depends(get_current_user_async)):
+    """Get the planned start dates of the user's pending tasks"""
+    try:
+        scheduled_tasks, next_cursor = await response_cache.call_async(
+            db, TaskScheduler, TaskScheduler.schedule_tasks, current_user.id, limit, cursor
+        )
+        return {"items": scheduled_tasks, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error scheduling tasks: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to schedule tasks"
+        )
+
+@router.get("/notify", response_model=NotificationPage)
+async def send_task_notifications(limit: int = Query(100, ge=1, le=1000),
+                                  cursor: Optional[str] = None,
+                                  db: AsyncSession = Depends(get_async_db),
+                                  current_user : int = Depends(get_current_user_async)):
+    """Send notifications for upcoming and overdue tasks"""
+    try:
+        notifications, next_cursor = await db.run_sync(
+            lambda session: TaskNotifier(session).send_notifications(
+                current_user.id, current_user.email, limit, cursor)
+        )
+        return {"items": notifications, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error sending notifications: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to send notifications"
+        )
+
+@router.get("/statistics", response_model=Dict)
+async def get_task_statistics(db: AsyncSession = Depends(get_async_read_db),
+                              current_user : int = Depends(get_current_user_async),
+                              etag: dict = Depends(task_etag_async(time_dependent=True))):
+    """Get task statistics and analytics"""
+    try:
+        return await response_cache.call_async(
+            db, TaskAnalytics, TaskAnalytics.get_task_statistics, current_user.id
+        )
+    except Exception as e:
+        logger.error(f"Error generating statistics: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to generate statistics"
+        )
+
+@router.get("/report", response_model=Dict)
+async def generate_task_report(db: AsyncSession = Depends(get_async_read_db),
+                               current_user : int = Depends(get_current_user_async),
+                               etag: dict = Depends(task_etag_async(time_dependent=True))):
+    """Generate detailed task analysis report"""
+    try:
+        return await response_cache.call_async(
+            db, TaskAnalytics, TaskAnalytics.generate_task_report, current_user.id
+        )
+    except Exception as e:
+        logger.error(f"Error generating report: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to generate report"
+        )
+
+@router.get("/getviz")
+async def get_visualizations(format: str = Query("png", pattern="^(png|svg)$"),
+                             db: AsyncSession = Depends(get_async_read_db),
+                             current_user: int = Depends(get_current_user_async),
+                             etag: dict = Depends(task_etag_async())):
+    """Get task priority distribution visualization"""
+
+    async def render():
+        counts = await db.run_sync(
+            lambda session: TaskAnalytics(session).priority_chart_counts(current_user.id)
+        )
+        # Rendering is CPU bound, so it runs off the event loop
+        return await run_in_threadpool(TaskAnalytics.render_priority_chart, counts, format)
+
+    # The same entry as TaskAnalytics.priority_chart(user_id, format) on the sync route
+    chart = await response_cache.get_or_compute_async(
+        TaskAnalytics.priority_chart.cache_name, current_user.id, ((format,), ()), render,
+        version=lambda: db.run_sync(lambda session: task_version(TaskAnalytics(session), current_user.id))
+    )
+
+    return StreamingResponse(
+        content=BytesIO(chart),
+        media_type="image/svg+xml" if format == "svg" else "image/png",
+        headers=etag
+    )
@@ -1,14 +1,23 @@
-from fastapi import Depends, HTTPException, status, APIRouter, Response
-from fastapi.responses import JSONResponse
-from database import get_db
-from utils import Taskutils
-from schemas import TaskModel,TaskCreate,UpdateDueDate,UpdateStatus,UpdateStatusResponse,UpdateDueDateResponse
+from fastapi import Depends, HTTPException, status, APIRouter, Response, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from database import get_db, SessionLocal
+from utils import Taskutils, BULK_MAX_ITEMS
+from schemas import TaskModel,TaskCreate,TaskPage,UpdateDueDate,UpdateStatus,UpdateStatusResponse,UpdateDueDateResponse
+from schemas import TaskPatch,TaskBulkItems,TaskBulkDelete,BulkResult
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Dict, Tuple
+from datetime import datetime
 import logging
+from responses import json_response
 import models
-from oauth2 import get_current_user
+import stats
+from oauth2 import get_current_user, get_read_db, task_etag
 from notify import push_notifications
+from events import broadcaster
+import asyncio
+import json
 
 
 logging.basicConfig(level=logging.INFO)
@@ -17,19 +26,47 @@ logger = logging.getLogger(__name__)
 router = APIRouter(tags=["task"],prefix="/task")
 
 
-@router.get("/", response_model=List[TaskModel])
-def get_tasks(db: Session = Depends(get_db),
-              current_user: int = Depends(get_current_user)):
-    try:
+def task_list_params(limit: int = Query(100, ge=1, le=1000),
+                     cursor: Optional[str] = None,
+                     status_filter: Optional[models.TaskStatus] = Query(None, alias="status"),
+                     priority: Optional[models.TaskPriority] = None,
+                     assigned_to: Optional[str] = None,
+                     due_after: Optional[datetime] = None,
+                     due_before: Optional[datetime] = None,
+                     fields: Optional[str] = None) -> dict:
+
+    """Query parameters of the task listing, as keyword arguments for Taskutils.list_tasks."""
+
+    return {
+        "limit": limit,
+        "cursor": cursor,
+        "status": status_filter.value if status_filter else None,
+        "priority": priority.value if priority else None,
+        "assigned_to": assigned_to,
+        "due_after": due_after,
+        "due_before": due_before,
+        "fields": [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    }
 
-        fill_na_func = Taskutils(db)
-        fill_na_func.handle_db_data()
 
-        tasks = db.query(models.TaskDB).filter(models.TaskDB.owner_id == current_user.id).all()
+@router.get("/", response_model=TaskPage)
+def get_tasks(params: dict = Depends(task_list_params),
+              db: Session = Depends(get_read_db),
+              current_user: int = Depends(get_current_user),
+              etag: dict = Depends(task_etag())):
+    try:
+
+        tasks, next_cursor = Taskutils(db).list_tasks(owner_id=current_user.id, **params)
 
         push_notifications(current_user.email, "fetch-tasks", {"message" : "Fetched Tasked Successfully."})
 
-        return tasks
+        # The fast path returns its own response, so the ETag headers go on it
+        return json_response({"items": tasks, "next_cursor": next_cursor}, headers=etag)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error fetching tasks: {e}")
         raise HTTPException(
@@ -38,16 +75,93 @@ def get_tasks(db: Session = Depends(get_db),
         )
 
 
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login", auto_error=False)
+
+
+def stream_token(token: Optional[str] = Query(None),
+                 bearer: Optional[str] = Depends(optional_oauth2_scheme)) -> str:
+
+    """Token of an event stream, from the Authorization header or, since
+    browsers' EventSource cannot set headers, from a `token` query parameter."""
+
+    if not (bearer or token):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                            detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+    return bearer or token
+
+
+def get_stream_user(token: str = Depends(stream_token)):
+
+    """Authenticate an event stream.
+
+    Uses its own short-lived session: a get_db session would only be closed
+    when the stream ends, holding a pooled connection for as long as the
+    client stays connected.
+    """
+
+    with SessionLocal() as db:
+        return get_current_user(token, db)
+
+
+STREAM_HEARTBEAT_SECONDS = 15
+
+
+def task_event_response(request: Request, user_id: int) -> StreamingResponse:
+
+    """Server-Sent Events response relaying the user's task events until the client leaves."""
+
+    subscriber = broadcaster.subscribe(user_id)
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(subscriber.get(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {payload['event']}\ndata: {json.dumps(payload, default=str)}\n\n"
+        finally:
+            broadcaster.unsubscribe(user_id, subscriber)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.get("/stream")
+async def stream_task_events(request: Request,
+                             current_user: int = Depends(get_stream_user)):
+    """Server-Sent Events feed of the user's task create/update/delete events"""
+
+    return task_event_response(request, current_user.id)
+
+
+def insert_task(db: Session, owner_id: int, task: TaskCreate) -> int:
+
+    """Insert and commit one task with its counters and change event; returns its id."""
+
+    task_data = Taskutils.normalize_task_data(task.model_dump())
+    new_task = models.TaskDB(owner_id = owner_id, **task_data)
+    db.add(new_task)
+    db.flush()
+    task_id = new_task.task_id
+    Taskutils(db).record_change(owner_id, task_id, "task_created",
+                                None, stats.snapshot(new_task))
+    db.commit()
+    return task_id
+
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 def create_task(task: TaskCreate, 
                 db: Session = Depends(get_db), 
                 current_user : int = Depends(get_current_user)):
     try:
-        new_task = models.TaskDB(owner_id = current_user.id, **task.model_dump())
-        db.add(new_task)
-        db.commit()
-        db.refresh(new_task)
-        return {"message": "Task created", "task_id": new_task.task_id}
+        task_id = insert_task(db, current_user.id, task)
+        return {"message": "Task created", "task_id": task_id}
     except Exception as e:
         db.rollback()
         logger.error(f"Error creating task: {e}")
@@ -56,23 +170,117 @@ def create_task(task: TaskCreate,
             detail="Failed to create task"
         )
 
+def validate_bulk_items(model, items: List[Dict]) -> Tuple[List[Tuple[int, Dict]], List[Dict]]:
+
+    """Validate each raw item against `model`, keeping its position in the request.
+
+    Returns:
+        Tuple containing ((index, data) of the valid items, error results of the others)
+    """
+
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"At most {BULK_MAX_ITEMS} items per request")
+
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item).model_dump(exclude_unset=True)))
+        except ValidationError as e:
+            message = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+                                for error in e.errors())
+            errors.append({"index": index, "error": message})
+
+    return valid, errors
+
+
+def run_bulk(db: Session, errors: List[Dict], atomic: bool, write) -> JSONResponse:
+
+    """Run a Taskutils bulk write and report every item of the request.
+
+    With `atomic` any failed item rolls the whole request back, and the
+    response is a 422; otherwise the valid items are committed.
+    """
+
+    try:
+        if errors and atomic:
+            results, committed = [], False
+        else:
+            results, committed = write()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error in bulk task write: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to write tasks"
+        )
+
+    results = sorted(errors + results, key=lambda result: result["index"])
+    failed = sum(1 for result in results if "error" in result)
+
+    return JSONResponse(
+        content={
+            "committed": committed,
+            "succeeded": len(results) - failed if committed else 0,
+            "failed": failed,
+            "results": results
+        },
+        status_code=status.HTTP_200_OK if committed else status.HTTP_422_UNPROCESSABLE_ENTITY
+    )
+
+
+# Declared before the /{id} routes, which would otherwise capture /bulk
+
+@router.post("/bulk", response_model=BulkResult)
+def create_tasks(body: TaskBulkItems,
+                 atomic: bool = False,
+                 db: Session = Depends(get_db),
+                 current_user : int = Depends(get_current_user)):
+    """Create many tasks in one transaction"""
+    valid, errors = validate_bulk_items(TaskCreate, body.items)
+    return run_bulk(db, errors, atomic,
+                    lambda: Taskutils(db).bulk_create(current_user.id, valid, atomic))
+
+
+@router.patch("/bulk", response_model=BulkResult)
+def update_tasks(body: TaskBulkItems,
+                 atomic: bool = False,
+                 db: Session = Depends(get_db),
+                 current_user : int = Depends(get_current_user)):
+    """Partially update many tasks in one transaction"""
+    valid, errors = validate_bulk_items(TaskPatch, body.items)
+    return run_bulk(db, errors, atomic,
+                    lambda: Taskutils(db).bulk_update(current_user.id, valid, atomic))
+
+
+@router.delete("/bulk", response_model=BulkResult)
+def delete_tasks(body: TaskBulkDelete,
+                 atomic: bool = False,
+                 db: Session = Depends(get_db),
+                 current_user : int = Depends(get_current_user)):
+    """Delete many tasks in one transaction"""
+    if len(body.task_ids) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"At most {BULK_MAX_ITEMS} items per request")
+    return run_bulk(db, [], atomic,
+                    lambda: Taskutils(db).bulk_delete(current_user.id, body.task_ids, atomic))
+
+
 @router.put("/{id}")
 def update_task(id : int, task : TaskModel, 
                 db : Session = Depends(get_db), 
                 current_user : int = Depends(get_current_user)):
     
-    query = db.query(models.TaskDB).filter(models.TaskDB.task_id == id,
-                                           models.TaskDB.owner_id == current_user.id)
+    # The row stays with its owner and id; counters are keyed by owner
+    task_data = Taskutils.normalize_task_data(task.model_dump())
+    task_data.pop("task_id", None)
+    task_data.pop("owner_id", None)
 
-    updated_task = query.first()
+    updated_task = Taskutils(db).update_task(id, current_user.id, task_data)
 
     if not updated_task:
         raise HTTPException(status_code= status.HTTP_404_NOT_FOUND, 
                             detail=f"post with id : {id} does not exist")
-    
-    query.update(task.model_dump(), synchronize_session = False)
-
-    db.commit()
 
     return {"data" : "successful"}
 
@@ -83,16 +291,11 @@ def delete_task(id : int,
                 db : Session = Depends(get_db),
                 current_user : int = Depends(get_current_user)):
 
-    task = db.query(models.TaskDB).filter(models.TaskDB.task_id == id,
-                                          models.TaskDB.owner_id == current_user.id)
+    deleted_task = Taskutils(db).delete_task(id, current_user.id)
 
-    if task.first() == None:
+    if deleted_task == None:
         raise HTTPException(status_code= status.HTTP_404_NOT_FOUND, 
                             detail=f"post with id : {id} does not exist")
-    
-
-    task.delete(synchronize_session = False)
-    db.commit()
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -0,0 +1,221 @@
+from fastapi import Depends, HTTPException, status, APIRouter, Response, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, AsyncSessionLocal
+from utils import Taskutils, BULK_MAX_ITEMS
+from schemas import TaskModel,TaskCreate,TaskPage,UpdateDueDate,UpdateStatus,UpdateStatusResponse,UpdateDueDateResponse
+from schemas import TaskPatch,TaskBulkItems,TaskBulkDelete,BulkResult
+from routers.task import task_list_params, insert_task, validate_bulk_items, run_bulk
+from routers.task import stream_token, task_event_response
+import logging
+from responses import json_response
+from oauth2 import get_current_user_async, get_async_read_db, task_etag_async
+from notify import push_notifications
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Async variants of the task routes, mounted ahead of the sync router when
+# ASYNC_DB is enabled. The query logic is shared with the sync routes by
+# running Taskutils through AsyncSession.run_sync, which drives the same ORM
+# code over asyncpg without occupying a threadpool thread.
+router = APIRouter(tags=["task"],prefix="/task")
+
+
+@router.get("/", response_model=TaskPage)
+async def get_tasks(params: dict = Depends(task_list_params),
+                    db: AsyncSession = Depends(get_async_read_db),
+                    current_user: int = Depends(get_current_user_async),
+                    etag: dict = Depends(task_etag_async())):
+    try:
+
+        tasks, next_cursor = await db.run_sync(
+            lambda session: Taskutils(session).list_tasks(owner_id=current_user.id, **params)
+        )
+
+        push_notifications(current_user.email, "fetch-tasks", {"message" : "Fetched Tasked Successfully."})
+
+        # The fast path returns its own response, so the ETag headers go on it
+        return json_response({"items": tasks, "next_cursor": next_cursor}, headers=etag)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error fetching tasks: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error occurred"
+        )
+
+
+async def get_stream_user_async(token: str = Depends(stream_token)):
+
+    """get_stream_user() on a short-lived async session."""
+
+    async with AsyncSessionLocal() as db:
+        return await get_current_user_async(token, db)
+
+
+@router.get("/stream")
+async def stream_task_events(request: Request,
+                             current_user: int = Depends(get_stream_user_async)):
+    """Server-Sent Events feed of the user's task create/update/delete events"""
+
+    return task_event_response(request, current_user.id)
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def create_task(task: TaskCreate,
+                      db: AsyncSession = Depends(get_async_db),
+                      current_user : int = Depends(get_current_user_async)):
+    try:
+        task_id = await db.run_sync(insert_task, current_user.id, task)
+        return {"message": "Task created", "task_id": task_id}
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error creating task: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create task"
+        )
+
+
+# Declared before the /{id} routes, which would otherwise capture /bulk
+
+@router.post("/bulk", response_model=BulkResult)
+async def create_tasks(body: TaskBulkItems,
+                       atomic: bool = False,
+                       db: AsyncSession = Depends(get_async_db),
+                       current_user : int = Depends(get_current_user_async)):
+    """Create many tasks in one transaction"""
+    valid, errors = validate_bulk_items(TaskCreate, body.items)
+    return await db.run_sync(lambda session: run_bulk(
+        session, errors, atomic, lambda: Taskutils(session).bulk_create(current_user.id, valid, atomic)))
+
+
+@router.patch("/bulk", response_model=BulkResult)
+async def update_tasks(body: TaskBulkItems,
+                       atomic: bool = False,
+                       db: AsyncSession = Depends(get_async_db),
+                       current_user : int = Depends(get_current_user_async)):
+    """Partially update many tasks in one transaction"""
+    valid, errors = validate_bulk_items(TaskPatch, body.items)
+    return await db.run_sync(lambda session: run_bulk(
+        session, errors, atomic, lambda: Taskutils(session).bulk_update(current_user.id, valid, atomic)))
+
+
+@router.delete("/bulk", response_model=BulkResult)
+async def delete_tasks(body: TaskBulkDelete,
+                       atomic: bool = False,
+                       db: AsyncSession = Depends(get_async_db),
+                       current_user : int = Depends(get_current_user_async)):
+    """Delete many tasks in one transaction"""
+    if len(body.task_ids) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"At most {BULK_MAX_ITEMS} items per request")
+    return await db.run_sync(lambda session: run_bulk(
+        session, [], atomic, lambda: Taskutils(session).bulk_delete(current_user.id, body.task_ids, atomic)))
+
+
+@router.put("/{id}")
+async def update_task(id : int, task : TaskModel,
+                      db : AsyncSession = Depends(get_async_db),
+                      current_user : int = Depends(get_current_user_async)):
+
+    # The row stays with its owner and id; counters are keyed by owner
+    task_data = Taskutils.normalize_task_data(task.model_dump())
+    task_data.pop("task_id", None)
+    task_data.pop("owner_id", None)
+
+    updated_task = await db.run_sync(
+        lambda session: Taskutils(session).update_task(id, current_user.id, task_data)
+    )
+
+    if not updated_task:
+        raise HTTPException(status_code= status.HTTP_404_NOT_FOUND,
+                            detail=f"post with id : {id} does not exist")
+
+    return {"data" : "successful"}
+
+
+@router.delete("/{id}")
+async def delete_task(id : int,
+                      db : AsyncSession = Depends(get_async_db),
+                      current_user : int = Depends(get_current_user_async)):
+
+    deleted_task = await db.run_sync(
+        lambda session: Taskutils(session).delete_task(id, current_user.id)
+    )
+
+    if deleted_task == None:
+        raise HTTPException(status_code= status.HTTP_404_NOT_FOUND,
+                            detail=f"post with id : {id} does not exist")
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.put("/update_status/{task_id}", response_model = UpdateStatusResponse)
+async def update_status(
+    task_id: int,
+    status_update: UpdateStatus,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: int = Depends(get_current_user_async)
+):
+    def update(session):
+        updated_task = Taskutils(session).update_task_status(
+            task_id=task_id,
+            owner_id = current_user.id,
+            status=status_update.status
+        )
+        if updated_task is None:
+            return None
+        return {
+            "task_id": updated_task.task_id,
+            "name": updated_task.name,
+            "status": updated_task.status
+        }
+
+    content = await db.run_sync(update)
+    
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    
+    return JSONResponse(content=content, status_code=status.HTTP_201_CREATED)
+
+
+@router.put("/update_task_due_date/{task_id}", response_model = UpdateDueDateResponse)
+async def update_due_date(
+    task_id: int,
+    due_date_update: UpdateDueDate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: int = Depends(get_current_user_async)
+):
+    def update(session):
+        updated_task = Taskutils(session).update_due_date(
+            task_id=task_id,
+            owner_id = current_user.id,
+            due_date=due_date_update.due_date
+        )
+        if updated_task is None:
+            return None
+        return {
+            "task_id": updated_task.task_id,
+            "name": updated_task.name,
+            "due_date": updated_task.due_date.isoformat() if updated_task.due_date else None
+        }
+
+    content = await db.run_sync(update)
+    
+    if content is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    
+    return JSONResponse(content=content, status_code=status.HTTP_201_CREATED)
@@ -4,8 +4,10 @@ from database import get_db
 from schemas import UserCreate,UserResponse
 from models import User
 import logging
+from responses import json_response
 from typing import List
-from utils import hash_password
+from hashing import hash_password_async, HashQueueFull
+from fastapi.concurrency import run_in_threadpool
 
 
 logging.basicConfig(level=logging.INFO)
@@ -17,15 +19,12 @@ router = APIRouter(tags=["user"],prefix="/users")
 def get_users(db: Session = Depends(get_db)):
 
     try:
-        users = db.query(User).all()
-        return [
-            UserResponse(
-                id=user.id,
-                email=user.email,
-                created_at=user.created_at.isoformat()
-            )
-            for user in users
-        ]
+        # Plain column tuples: no ORM identity map or per-row model construction
+        users = db.query(User.id, User.email, User.created_at).all()
+        return json_response([
+            {"id": id, "email": email, "created_at": created_at.isoformat()}
+            for id, email, created_at in users
+        ])
     except Exception as e:
         logger.error(f"Error fetching users: {e}")
         raise HTTPException(
@@ -34,18 +33,29 @@ def get_users(db: Session = Depends(get_db)):
         )
 
 @router.post("/",status_code=status.HTTP_201_CREATED,response_model=UserResponse)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-
-    #hash the pass
-    hash_pass = hash_password(user.password)
-    user.password = hash_pass
+async def create_user(user: UserCreate, db: Session = Depends(get_db)):
 
+    #hash the pass off the event loop, in the bounded hash pool
     try:
+        hash_pass = await hash_password_async(user.password)
+    except HashQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ups in progress, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    user.password = hash_pass
 
+    def insert_user():
         new_user = User(**user.model_dump())
         db.add(new_user)
         db.commit()
         db.refresh(new_user)
+        return new_user
+
+    try:
+
+        new_user = await run_in_threadpool(insert_user)
         return {
             "id": new_user.id,
             "email": new_user.email,
@@ -54,7 +64,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     
     except Exception as e:
 
-        db.rollback()
+        await run_in_threadpool(db.rollback)
         logger.error(f"Error creating user: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
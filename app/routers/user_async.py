@@ -0,0 +1,90 @@
+from fastapi import Depends, HTTPException, status, APIRouter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from schemas import UserCreate,UserResponse
+from models import User
+import logging
+from responses import json_response
+from typing import List
+from hashing import hash_password_async, HashQueueFull
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Async variants of the user routes, mounted ahead of the sync router when
+# ASYNC_DB is enabled.
+router = APIRouter(tags=["user"],prefix="/users")
+
+@router.get("/",status_code=status.HTTP_200_OK, response_model = List[UserResponse])
+async def get_users(db: AsyncSession = Depends(get_async_db)):
+
+    try:
+        # Plain column tuples: no ORM identity map or per-row model construction
+        users = (await db.execute(select(User.id, User.email, User.created_at))).all()
+        return json_response([
+            {"id": id, "email": email, "created_at": created_at.isoformat()}
+            for id, email, created_at in users
+        ])
+    except Exception as e:
+        logger.error(f"Error fetching users: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error occurred"
+        )
+
+@router.post("/",status_code=status.HTTP_201_CREATED,response_model=UserResponse)
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+
+    #hash the pass off the event loop, in the bounded hash pool
+    try:
+        hash_pass = await hash_password_async(user.password)
+    except HashQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ups in progress, retry shortly",
+            headers={"Retry-After": "1"}
+        )
+    user.password = hash_pass
+
+    try:
+
+        new_user = User(**user.model_dump())
+        db.add(new_user)
+        await db.commit()
+        await db.refresh(new_user)
+        return {
+            "id": new_user.id,
+            "email": new_user.email,
+            "created_at": new_user.created_at.isoformat()
+        }
+
+    except Exception as e:
+
+        await db.rollback()
+        logger.error(f"Error creating user: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create user"
+        )
+
+
+@router.get("/{id}",status_code=status.HTTP_200_OK, response_model=UserResponse)
+async def get_user_by_id(id : int, db : AsyncSession = Depends(get_async_db)):
+
+    try:
+
+        user = (await db.execute(
+            select(User.id, User.email, User.created_at).where(User.id == id)
+        )).first()
+        return {
+            "id": user.id,
+            "email": user.email,
+            "created_at": user.created_at.isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"Error Finding the error : {e}")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, 
+                            detail="User Not Found")
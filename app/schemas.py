@@ -1,21 +1,24 @@
 from pydantic import BaseModel, ConfigDict, EmailStr
-from typing import Optional, Union
+from typing import Optional, Union, List, Dict, Any
 from datetime import datetime
+from models import TaskStatus, TaskPriority
 
 class TaskModel(BaseModel):
     task_id: int
     name: str
     description: Union[str, None]
-    status: str
+    status: TaskStatus
     due_date: datetime
     completed_date: Optional[datetime] = None
     assigned_to: Union[str, None]
-    priority: Optional[str] = "medium"
+    priority: Optional[TaskPriority] = TaskPriority.medium
     owner_id : int
 
 
     model_config = ConfigDict(
         from_attributes=True,
+        use_enum_values=True,
+        validate_default=True,
         json_encoders={
             datetime: lambda v: v.isoformat() if v else None
         }
@@ -25,15 +28,66 @@ class TaskModel(BaseModel):
     #     from_attributes=True
 
 
+class TaskPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
+class NotificationPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
+class SchedulePage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
 class TaskCreate(BaseModel):
     
     name: str
-    status: str
+    status: TaskStatus
     due_date: datetime
 
+    model_config = ConfigDict(use_enum_values=True)
+
+
+class TaskPatch(BaseModel):
+
+    """One item of PATCH /task/bulk; only the fields present are changed."""
+
+    task_id: int
+    name: str = None
+    description: Optional[str] = None
+    status: TaskStatus = None
+    due_date: datetime = None
+    completed_date: Optional[datetime] = None
+    assigned_to: Optional[str] = None
+    priority: TaskPriority = None
+
+    model_config = ConfigDict(extra="forbid", use_enum_values=True)
+
+
+class TaskBulkItems(BaseModel):
+    # Items are validated one by one so that errors are reported per item
+    items: List[Dict[str, Any]]
+
+
+class TaskBulkDelete(BaseModel):
+    task_ids: List[int]
+
+
+class BulkResult(BaseModel):
+    committed: bool
+    succeeded: int
+    failed: int
+    results: List[Dict[str, Any]]
+
 
 class UpdateStatus(BaseModel):
-    status: str
+    status: TaskStatus
+
+    model_config = ConfigDict(use_enum_values=True)
 
 class UpdateStatusResponse(BaseModel):
     task_id : int
@@ -79,3 +133,4 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     id : Optional[int] = None
+    email : Optional[str] = None
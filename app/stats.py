@@ -0,0 +1,184 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import func, and_, delete, select, literal_column, text
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from models import TaskDB, TaskStats
+import models
+
+
+def snapshot(task) -> Dict:
+
+    """Capture the task columns that feed the counters and the scheduler from an ORM object or row."""
+
+    return {
+        "status": task.status,
+        "priority": task.priority,
+        "due_date": task.due_date,
+        "completed_date": task.completed_date,
+        "assigned_to": task.assigned_to,
+    }
+
+
+def _contribution(task: Dict) -> Tuple[Tuple[str, str], Dict]:
+
+    """Return the counter bucket of a task and what it adds to that bucket."""
+
+    status = task.get("status") or models.DEFAULT_STATUS
+    priority = task.get("priority") or models.DEFAULT_PRIORITY
+
+    completed = (status == "completed" and task.get("completed_date") is not None)
+    seconds = 0.0
+    if completed and task.get("due_date") is not None:
+        seconds = (task["completed_date"] - task["due_date"]).total_seconds()
+
+    return (status, priority), {
+        "task_count": 1,
+        "completed_count": 1 if completed else 0,
+        "completion_seconds": seconds,
+    }
+
+
+def task_changes_upsert(owner_id: int, changes):
+
+    """Build the upsert that applies a batch of (old, new) task snapshots to the owner's counters.
+
+    `old` is None for inserted tasks and `new` is None for deleted ones. The
+    deltas are folded per bucket into a single statement, which the caller
+    executes inside its transaction so the counters commit or roll back with
+    the tasks. Returns None when no counter moves.
+    """
+
+    deltas = {}
+    for old, new in changes:
+        for task, sign in ((old, -1), (new, 1)):
+            if task is None:
+                continue
+            key, contribution = _contribution(task)
+            bucket = deltas.setdefault(key, {"task_count": 0, "completed_count": 0,
+                                             "completion_seconds": 0.0})
+            for column, value in contribution.items():
+                bucket[column] += sign * value
+
+    rows = [
+        {"owner_id": owner_id, "status": status, "priority": priority, **bucket}
+        for (status, priority), bucket in deltas.items()
+        if any(bucket.values())
+    ]
+    if not rows:
+        return None
+
+    stmt = insert(TaskStats).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[TaskStats.owner_id, TaskStats.status, TaskStats.priority],
+        set_={
+            "task_count": TaskStats.task_count + stmt.excluded.task_count,
+            "completed_count": TaskStats.completed_count + stmt.excluded.completed_count,
+            "completion_seconds": TaskStats.completion_seconds + stmt.excluded.completion_seconds,
+        }
+    )
+
+
+def priority_counts(db: Session, owner_id: int) -> Dict[str, int]:
+
+    """Return the owner's task count per priority from the counters."""
+
+    rows = db.query(TaskStats.priority, func.sum(TaskStats.task_count))\
+        .filter(TaskStats.owner_id == owner_id)\
+        .group_by(TaskStats.priority).all()
+
+    return {priority: int(count) for priority, count in rows if count}
+
+
+def read_statistics(db: Session, owner_id: int) -> Tuple[Dict, Dict]:
+
+    """Build task statistics and the status distribution from the counters.
+
+    The counters are read by primary key prefix. Overdue tasks depend on the
+    current time and cannot be maintained incrementally, so they are counted
+    through the (owner_id, status, due_date) index.
+
+    Returns:
+        Tuple containing (statistics dict, status distribution dict)
+    """
+
+    rows = db.query(TaskStats).filter(TaskStats.owner_id == owner_id).all()
+
+    overdue_tasks = db.query(func.count(TaskDB.task_id)).filter(
+        TaskDB.owner_id == owner_id,
+        TaskDB.due_date < datetime.now(),
+        TaskDB.status != "completed"
+    ).scalar()
+
+    total_tasks = completed_tasks = 0
+    completion_seconds = 0.0
+    priority_distribution = {}
+    status_distribution = {}
+
+    for row in rows:
+        if row.task_count <= 0:
+            continue
+        total_tasks += row.task_count
+        completed_tasks += row.completed_count
+        completion_seconds += row.completion_seconds
+        priority_distribution[row.priority] = priority_distribution.get(row.priority, 0) + row.task_count
+        status_distribution[row.status] = status_distribution.get(row.status, 0) + row.task_count
+
+    avg_completion_time = (timedelta(seconds=completion_seconds / completed_tasks) if completed_tasks
+                           else timedelta())
+
+    statistics = {
+        "total_tasks": total_tasks,
+        "overdue_tasks": overdue_tasks,
+        "completed_tasks": completed_tasks,
+        "average_completion_time_days": avg_completion_time.days,
+        "priority_distribution": priority_distribution
+    }
+
+    return statistics, status_distribution
+
+
+def reconcile(db: Session, owner_id: Optional[int] = None) -> int:
+
+    """Rebuild the counters from the tasks table, for one owner or for everyone.
+
+    Returns:
+        Number of counter rows written
+    """
+
+    status = func.coalesce(TaskDB.status, models.DEFAULT_STATUS)
+    priority = func.coalesce(TaskDB.priority, models.DEFAULT_PRIORITY)
+    is_completed = and_(TaskDB.status == "completed", TaskDB.completed_date.isnot(None))
+
+    source = select(
+        TaskDB.owner_id,
+        status,
+        priority,
+        func.count(TaskDB.task_id),
+        func.count(TaskDB.task_id).filter(is_completed),
+        func.coalesce(
+            func.sum(
+                func.extract("epoch", TaskDB.completed_date - TaskDB.due_date)
+            ).filter(is_completed),
+            literal_column("0")
+        )
+    ).group_by(TaskDB.owner_id, status, priority)
+
+    clear = delete(TaskStats)
+    if owner_id is not None:
+        source = source.where(TaskDB.owner_id == owner_id)
+        clear = clear.where(TaskStats.owner_id == owner_id)
+
+    # Block concurrent counter upserts until the rebuild commits; plain reads
+    # of the counters are still allowed
+    db.execute(text("LOCK TABLE task_stats IN EXCLUSIVE MODE"))
+    db.execute(clear)
+    result = db.execute(
+        insert(TaskStats).from_select(
+            ["owner_id", "status", "priority", "task_count", "completed_count", "completion_seconds"],
+            source
+        )
+    )
+    db.commit()
+
+    return result.rowcount
@@ -1,166 +1,700 @@
 from models import TaskDB
 from sqlalchemy.orm import Session
 from models import TaskDB
-import smtplib
-from email.mime.text import MIMEText
-from datetime import datetime, timedelta
-from typing import List, Dict, Tuple
+from datetime import datetime, timedelta, date
+from typing import List, Dict, Tuple, Optional, Iterator
 import models
-from sqlalchemy import func
-import pandas as pd
+import stats
+import versions
+from database import try_advisory_lock
+from cache import response_cache, invalidate_on_commit
+from mailer import enqueue_email
+from events import queue_task_events
+from sqlalchemy import func, tuple_, and_, select, insert, update, delete, values, column, cast, case, any_, literal, Integer
+from sqlalchemy.dialects.postgresql import insert as pg_insert, ARRAY
+from itertools import groupby
+import heapq
+import logging
+import time
+import base64
+import csv
+import json
 from io import StringIO,BytesIO
-import bcrypt
-import matplotlib.pyplot as plt
+from string import Template
+from functools import lru_cache
+from xml.sax.saxutils import escape
+import math
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-def hash_password(password : str):
-    return bcrypt.hashpw(password.encode('utf-8'),bcrypt.gensalt())
 
-def verify(plain_pass, hash_pass):
-    return bcrypt.checkpw(plain_pass.encode('utf-8'), hash_pass)
+def task_version(instance, user_id: int) -> int:
+
+    """Cache key version of a TaskAnalytics/TaskScheduler result: the user's task version."""
+
+    return versions.current(instance.db, user_id)
+
+
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "10000"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
 
 
 class Taskutils:
 
+    # Columns a client may request through the `fields` projection
+    LIST_FIELDS = ("task_id", "name", "description", "status", "due_date",
+                   "completed_date", "assigned_to", "priority", "owner_id")
+
     def __init__(self,db : Session) :
         self.db = db
 
-    def handle_db_data(self):
+    @staticmethod
+    def encode_cursor(due_date: Optional[datetime], task_id: int) -> str:
 
-        """Replace NULL values in the database with default values."""
+        """Encode the (due_date, task_id) keyset position of a row as an opaque cursor."""
 
-        default_completed_date = datetime(9999, 12, 31, 0, 0, 0)
-        
-        self.db.query(TaskDB).filter(TaskDB.description.is_(None)).update(
-            {TaskDB.description: "No description"}, synchronize_session=False
-        )
-        self.db.query(TaskDB).filter(TaskDB.completed_date.is_(None)).update(
-            {TaskDB.completed_date: default_completed_date}, synchronize_session=False
-        )
-        self.db.query(TaskDB).filter(TaskDB.assigned_to.is_(None)).update(
-            {TaskDB.assigned_to: "Unassigned"}, synchronize_session=False
-        )
-        self.db.query(TaskDB).filter(TaskDB.priority.is_(None)).update(
-            {TaskDB.priority: "medium"}, synchronize_session=False
+        payload = json.dumps([due_date.isoformat() if due_date else None, task_id])
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+
+        """Decode a cursor produced by encode_cursor, raising ValueError if malformed."""
+
+        try:
+            due_date, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            return (datetime.fromisoformat(due_date) if due_date is not None else None), int(task_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+    def list_tasks(self, owner_id: int, limit: int = 100, cursor: Optional[str] = None,
+                   status: Optional[str] = None, priority: Optional[str] = None,
+                   assigned_to: Optional[str] = None, due_after: Optional[datetime] = None,
+                   due_before: Optional[datetime] = None,
+                   fields: Optional[List[str]] = None) -> Tuple[List[Dict], Optional[str]]:
+
+        """Fetch one keyset page of a user's tasks ordered by (due_date, task_id).
+
+        Only the requested `fields` are selected. The position is carried in an
+        opaque cursor, so fetching page N costs the same as fetching page 1.
+        Tasks without a due date come last, ordered by task_id.
+
+        Returns:
+            Tuple containing (list of task dicts, cursor for the next page or None)
+        """
+
+        fields = list(dict.fromkeys(fields)) if fields else list(self.LIST_FIELDS)
+        unknown = [field for field in fields if field not in self.LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+        # The keyset columns are always selected so the next cursor can be built
+        selected = list(dict.fromkeys(fields + ["due_date", "task_id"]))
+        columns = [getattr(TaskDB, field) for field in selected]
+
+        query = self.db.query(*columns).filter(TaskDB.owner_id == owner_id)
+
+        if status is not None:
+            query = query.filter(TaskDB.status == status)
+        if priority is not None:
+            query = query.filter(TaskDB.priority == priority)
+        if assigned_to is not None:
+            query = query.filter(TaskDB.assigned_to == assigned_to)
+        if due_after is not None:
+            query = query.filter(TaskDB.due_date >= due_after)
+        if due_before is not None:
+            query = query.filter(TaskDB.due_date < due_before)
+        # NULLS LAST is the index order; a NULL never satisfies the row-value
+        # comparison, so the undated tail is paged by task_id on its own
+        order = (TaskDB.due_date.asc().nullslast(), TaskDB.task_id.asc())
+        undated = query.filter(TaskDB.due_date.is_(None))
+
+        # Fetch one extra row to know whether another page exists
+        if cursor is None:
+            rows = query.order_by(*order).limit(limit + 1).all()
+        else:
+            after_due_date, after_task_id = self.decode_cursor(cursor)
+            if after_due_date is None:
+                rows = undated.filter(TaskDB.task_id > after_task_id)\
+                    .order_by(*order).limit(limit + 1).all()
+            else:
+                rows = query.filter(
+                    tuple_(TaskDB.due_date, TaskDB.task_id) > tuple_(after_due_date, after_task_id)
+                ).order_by(*order).limit(limit + 1).all()
+                # The dated rows ran out within this page: continue into the undated ones
+                if len(rows) <= limit:
+                    rows += undated.order_by(*order).limit(limit + 1 - len(rows)).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = self.encode_cursor(last.due_date, last.task_id)
+
+        # The requested fields lead the selected columns, in order
+        items = [dict(zip(fields, row)) for row in rows]
+
+        return items, next_cursor
+
+    @staticmethod
+    def normalize_task_data(data: Dict) -> Dict:
+
+        """Fill missing optional task fields with their defaults before writing."""
+
+        defaults = {
+            "description": models.DEFAULT_DESCRIPTION,
+            "assigned_to": models.DEFAULT_ASSIGNEE,
+            "priority": models.DEFAULT_PRIORITY,
+            "status": models.DEFAULT_STATUS,
+        }
+
+        normalized = dict(data)
+        for field, default in defaults.items():
+            if field in normalized and normalized[field] is None:
+                normalized[field] = default
+
+        return normalized
+
+    def backfill_defaults(self, batch_size: int = 10000) -> Dict[str, int]:
+
+        """One-off migration: replace legacy NULL values with the column defaults.
+
+        Rows are updated in primary key batches so that no statement holds
+        locks over the whole table.
+        """
+
+        defaults = {
+            TaskDB.description: models.DEFAULT_DESCRIPTION,
+            TaskDB.assigned_to: models.DEFAULT_ASSIGNEE,
+            TaskDB.priority: models.DEFAULT_PRIORITY,
+            TaskDB.status: models.DEFAULT_STATUS,
+        }
+
+        updated = {}
+        for field, default in defaults.items():
+            total = 0
+            while True:
+                batch = self.db.query(TaskDB.task_id).filter(field.is_(None)).limit(batch_size)
+                count = self.db.query(TaskDB).filter(TaskDB.task_id.in_(batch.scalar_subquery())).update(
+                    {field: default}, synchronize_session=False
+                )
+                self.db.commit()
+                total += count
+                if count < batch_size:
+                    break
+            updated[field.key] = total
+
+        return updated
+
+
+    def record_change(self, owner_id: int, task_id: int, event_name: str,
+                      old: Optional[Dict], new: Optional[Dict]):
+
+        """Side effects of a task mutation that must ride on the same transaction.
+
+        Updates the owner's task_stats counters and queues the change event for
+        the /task/stream subscribers. `old`/`new` are stats.snapshot()-style dicts,
+        None for inserts and deletes respectively.
+        """
+
+        self.record_changes(owner_id, [(task_id, event_name, old, new)])
+
+    def record_changes(self, owner_id: int, changes: List[Tuple[int, str, Optional[Dict], Optional[Dict]]]):
+
+        """record_change() for a batch of (task_id, event_name, old, new) changes.
+        Also bumps the owner's task version, which invalidates their ETags, and
+        drops their cached analytics once the transaction commits.
+
+        The counter upsert, and the scheduler marks of deleted pending tasks, ride
+        on the version bump as data-modifying CTEs, so the whole batch costs one
+        statement, plus one NOTIFY with the postgres event backend.
+        """
+
+        stmt = versions.bump_statement([owner_id])
+        counters = stats.task_changes_upsert(owner_id, [(old, new) for _, _, old, new in changes])
+        if counters is not None:
+            stmt = stmt.add_cte(counters.cte("counter_upsert"))
+        dirty = TaskScheduler.mark_deleted_statement(owner_id, [old for _, _, old, new in changes
+                                                                if new is None and old is not None])
+        if dirty is not None:
+            stmt = stmt.add_cte(dirty.cte("schedule_dirty_upsert"))
+        self.db.execute(stmt)
+        invalidate_on_commit(self.db, [owner_id])
+        queue_task_events(self.db, owner_id, [(event_name, task_id, new)
+                                              for task_id, event_name, _, new in changes])
+
+    # Columns returned by bulk writes to build the counter snapshots
+    SNAPSHOT_COLUMNS = (TaskDB.task_id, TaskDB.status, TaskDB.priority,
+                        TaskDB.due_date, TaskDB.completed_date, TaskDB.assigned_to)
+
+    @staticmethod
+    def _task_id_in(task_ids: List[int]):
+        # A single array parameter instead of one bind parameter per id
+        return TaskDB.task_id == any_(literal(list(task_ids), ARRAY(Integer)))
+
+    def _finish_bulk(self, results: List[Dict], changes: List, owner_id: int, atomic: bool) -> bool:
+
+        """Record the changes and commit, or roll back when `atomic` and an item failed.
+
+        Returns:
+            Whether the transaction was committed
+        """
+
+        if atomic and any("error" in result for result in results):
+            self.db.rollback()
+            return False
+
+        if changes:
+            self.record_changes(owner_id, changes)
+        self.db.commit()
+        return True
+
+    def bulk_create(self, owner_id: int, items: List[Tuple[int, Dict]],
+                    atomic: bool = False) -> Tuple[List[Dict], bool]:
+
+        """Insert validated (index, task data) items in one transaction.
+
+        Rows go out as multi-row INSERT ... VALUES ... RETURNING statements of
+        BULK_CHUNK_SIZE rows, with the generated ids matched back to items by
+        parameter order.
+
+        Returns:
+            Tuple containing (per-item results, whether the transaction was committed)
+        """
+
+        results = []
+        changes = []
+        for start in range(0, len(items), BULK_CHUNK_SIZE):
+            chunk = items[start:start + BULK_CHUNK_SIZE]
+            rows = [dict(self.normalize_task_data(data), owner_id=owner_id) for _, data in chunk]
+            created = self.db.execute(
+                insert(TaskDB.__table__).returning(*self.SNAPSHOT_COLUMNS, sort_by_parameter_order=True),
+                rows
+            ).all()
+            for (index, _), row in zip(chunk, created):
+                results.append({"index": index, "task_id": row.task_id})
+                changes.append((row.task_id, "task_created", None, stats.snapshot(row)))
+
+        return results, self._finish_bulk(results, changes, owner_id, atomic)
+
+    def bulk_update(self, owner_id: int, items: List[Tuple[int, Dict]],
+                    atomic: bool = False) -> Tuple[List[Dict], bool]:
+
+        """Apply validated (index, {"task_id": ..., column: value}) partial updates.
+
+        The target rows are locked and their old values read with one SELECT ...
+        FOR UPDATE. Items that set the same columns are then written together by
+        UPDATE ... FROM (VALUES ...) statements of BULK_CHUNK_SIZE rows.
+
+        Returns:
+            Tuple containing (per-item results, whether the transaction was committed)
+        """
+
+        task_ids = [data["task_id"] for _, data in items]
+        old = {
+            row.task_id: stats.snapshot(row)
+            for row in self.db.query(*self.SNAPSHOT_COLUMNS).filter(
+                TaskDB.owner_id == owner_id, self._task_id_in(task_ids)
+            ).order_by(TaskDB.task_id).with_for_update()
+        }
+
+        results = []
+        groups = {}
+        seen = set()
+        for index, data in items:
+            task_id = data["task_id"]
+            if task_id not in old:
+                results.append({"index": index, "task_id": task_id, "error": "Task not found"})
+            elif task_id in seen:
+                results.append({"index": index, "task_id": task_id, "error": "Duplicate task_id"})
+            else:
+                seen.add(task_id)
+                data = self.normalize_task_data(data)
+                columns = tuple(sorted(key for key in data if key != "task_id"))
+                groups.setdefault(columns, []).append((index, data))
+
+        table = TaskDB.__table__
+        changes = []
+        for columns, group in groups.items():
+            for start in range(0, len(group), BULK_CHUNK_SIZE):
+                chunk = group[start:start + BULK_CHUNK_SIZE]
+                updated = {}
+                if columns:
+                    rows = values(column("task_id", Integer),
+                                  *[column(name, table.c[name].type) for name in columns],
+                                  name="v").data(
+                        [tuple(data[name] for name in ("task_id",) + columns) for _, data in chunk]
+                    )
+                    stmt = update(table).where(
+                        table.c.task_id == rows.c.task_id,
+                        table.c.owner_id == owner_id
+                    ).values(
+                        self._bulk_set_values(table, rows, columns)
+                    ).returning(*self.SNAPSHOT_COLUMNS)
+                    updated = {row.task_id: stats.snapshot(row) for row in self.db.execute(stmt)}
+
+                for index, data in chunk:
+                    task_id = data["task_id"]
+                    results.append({"index": index, "task_id": task_id})
+                    if task_id in updated:
+                        changes.append((task_id, "task_updated", old[task_id], updated[task_id]))
+
+        results.sort(key=lambda result: result["index"])
+        return results, self._finish_bulk(results, changes, owner_id, atomic)
+
+    @staticmethod
+    def _bulk_set_values(table, rows, columns: Tuple[str, ...]) -> Dict:
+
+        """SET clause of a bulk UPDATE ... FROM (VALUES ...), with update_task's
+        rule that a task becoming completed gets a completed_date."""
+
+        # VALUES columns are untyped text to PostgreSQL, hence the casts
+        set_values = {name: cast(rows.c[name], table.c[name].type) for name in columns}
+        if "status" in set_values:
+            completed_date = set_values.get("completed_date", table.c.completed_date)
+            set_values["completed_date"] = case(
+                (set_values["status"] == models.TaskStatus.completed.value,
+                 func.coalesce(completed_date, table.c.completed_date, func.localtimestamp())),
+                else_=completed_date
+            )
+
+        return set_values
+
+    def bulk_delete(self, owner_id: int, task_ids: List[int],
+                    atomic: bool = False) -> Tuple[List[Dict], bool]:
+
+        """Delete the user's tasks with one DELETE ... WHERE task_id = ANY(...) RETURNING.
+
+        Returns:
+            Tuple containing (per-item results, whether the transaction was committed)
+        """
+
+        deleted = {}
+        for start in range(0, len(task_ids), BULK_CHUNK_SIZE):
+            chunk = task_ids[start:start + BULK_CHUNK_SIZE]
+            stmt = delete(TaskDB.__table__).where(
+                TaskDB.owner_id == owner_id, self._task_id_in(chunk)
+            ).returning(*self.SNAPSHOT_COLUMNS)
+            deleted.update((row.task_id, stats.snapshot(row)) for row in self.db.execute(stmt))
+
+        results = []
+        changes = []
+        seen = set()
+        for index, task_id in enumerate(task_ids):
+            if task_id in seen:
+                results.append({"index": index, "task_id": task_id, "error": "Duplicate task_id"})
+            elif task_id in deleted:
+                results.append({"index": index, "task_id": task_id})
+                changes.append((task_id, "task_deleted", deleted[task_id], None))
+            else:
+                results.append({"index": index, "task_id": task_id, "error": "Task not found"})
+            seen.add(task_id)
+
+        return results, self._finish_bulk(results, changes, owner_id, atomic)
+
+    def update_task(self, task_id: int, owner_id: int, data: Dict):
+
+        """Write `data` to one of the owner's tasks in a single UPDATE ... RETURNING.
+
+        The old values needed by the counters come from a FOR UPDATE subquery
+        in the same statement. A task that becomes completed gets its
+        completed_date set unless the caller provides one.
+
+        Returns:
+            Row with the task's id, name and new column values, or None if not found
+        """
+
+        table = TaskDB.__table__
+        old = select(*self.SNAPSHOT_COLUMNS).where(
+            TaskDB.task_id == task_id, TaskDB.owner_id == owner_id
+        ).with_for_update().subquery("old")
+
+        data = dict(data)
+        if data.get("status") == models.TaskStatus.completed.value and data.get("completed_date") is None:
+            data["completed_date"] = func.coalesce(table.c.completed_date, func.localtimestamp())
+
+        snapshot_names = [column.key for column in self.SNAPSHOT_COLUMNS if column.key != "task_id"]
+        stmt = update(table).where(table.c.task_id == old.c.task_id).values(data).returning(
+            table.c.task_id, table.c.name, *[table.c[name] for name in snapshot_names],
+            *[old.c[name].label(f"old_{name}") for name in snapshot_names]
         )
+        task = self.db.execute(stmt).first()
+        if task is None:
+            self.db.rollback()
+            return None
+
+        previous = {name: getattr(task, f"old_{name}") for name in snapshot_names}
+        self.record_change(owner_id, task_id, "task_updated", previous, stats.snapshot(task))
+        self.db.commit()
+
+        return task
+
+    def delete_task(self, task_id: int, owner_id: int):
+
+        """Delete one of the owner's tasks with a single DELETE ... RETURNING.
+
+        The counters are adjusted with the values of the row actually deleted,
+        so a concurrent update cannot leave them on a stale bucket.
+
+        Returns:
+            Row with the deleted task's counter columns, or None if not found
+        """
+
+        stmt = delete(TaskDB.__table__).where(
+            TaskDB.task_id == task_id, TaskDB.owner_id == owner_id
+        ).returning(*self.SNAPSHOT_COLUMNS)
+        task = self.db.execute(stmt).first()
+        if task is None:
+            self.db.rollback()
+            return None
 
+        self.record_change(owner_id, task_id, "task_deleted", stats.snapshot(task), None)
         self.db.commit()
 
+        return task
 
     def update_task_status(self, task_id: int, owner_id : int, status: str):
 
         "Update Task Status for a specific Task"
 
-        task = self.db.query(TaskDB).filter(TaskDB.task_id == task_id,
-                                            models.TaskDB.owner_id == owner_id).first()
-        if task:
-            task.status = status
-            self.db.commit()
-            return task
-        return None
+        return self.update_task(task_id, owner_id, {"status": status})
 
     def update_due_date(self, task_id: int, owner_id : int, due_date: str):
 
         "Update Task Due Date for a specific Task"
 
-        task = self.db.query(TaskDB).filter(TaskDB.task_id == task_id,
-                                            models.TaskDB.owner_id == owner_id).first()
-        if task:
-            task.due_date = due_date
-            self.db.commit()
-            return task
-        return None
+        return self.update_task(task_id, owner_id, {"due_date": due_date})
     
+class _ChunkSink:
+
+    """Write-only file object that hands out whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
 class TaskAnalytics:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_task_statistics(self, user_id: int) -> Dict:
+    def _aggregate_tasks(self, user_id: int) -> Tuple[Dict, Dict]:
 
-        "Calculate various task statistics for a specific user"
+        """Compute task statistics and the status distribution in a single statement.
 
-        
-        total_tasks = self.db.query(models.TaskDB).filter(
-            models.TaskDB.owner_id == user_id
-        ).count()
-        
-        overdue_tasks = self.db.query(models.TaskDB).filter(
-            models.TaskDB.due_date < datetime.now(),
-            models.TaskDB.status != "completed",
-            models.TaskDB.owner_id == user_id
-        ).count()
-        
-        completed_tasks = self.db.query(models.TaskDB).filter(
-            models.TaskDB.status == "completed",
-            models.TaskDB.completed_date.isnot(None),
-            models.TaskDB.owner_id == user_id
-        ).all()
-        
+        The user's tasks are grouped by (status, priority) with conditional
+        aggregates, so only a handful of rows come back regardless of how many
+        tasks the user owns, and no ORM objects are loaded. This is the
+        reference computation that the task_stats counters must agree with.
+
+        Returns:
+            Tuple containing (statistics dict, status distribution dict)
+        """
+        is_completed = and_(models.TaskDB.status == "completed",
+                            models.TaskDB.completed_date.isnot(None))
+
+        rows = self.db.query(
+            models.TaskDB.status,
+            models.TaskDB.priority,
+            func.count(models.TaskDB.task_id).label("total"),
+            func.count(models.TaskDB.task_id).filter(
+                models.TaskDB.due_date < datetime.now(),
+                models.TaskDB.status != "completed"
+            ).label("overdue"),
+            func.count(models.TaskDB.task_id).filter(is_completed).label("completed"),
+            func.sum(
+                models.TaskDB.completed_date - models.TaskDB.due_date
+            ).filter(is_completed).label("completion_time")
+        ).filter(models.TaskDB.owner_id == user_id)\
+        .group_by(models.TaskDB.status, models.TaskDB.priority).all()
+
+        total_tasks = overdue_tasks = completed_tasks = 0
         total_completion_time = timedelta()
-        for task in completed_tasks:
-            if task.completed_date and task.due_date:
-                total_completion_time += task.completed_date - task.due_date
-                
-        avg_completion_time = (total_completion_time / len(completed_tasks) if completed_tasks 
-                             else timedelta())
-
-        # Update priority distribution query to filter by user
-        priority_distribution = dict(
-            self.db.query(
-                models.TaskDB.priority,
-                func.count(models.TaskDB.task_id)
-            ).filter(models.TaskDB.owner_id == user_id)
-            .group_by(models.TaskDB.priority).all()
-        )
+        priority_distribution = {}
+        status_distribution = {}
 
-        return {
+        for row in rows:
+            total_tasks += row.total
+            overdue_tasks += row.overdue
+            completed_tasks += row.completed
+            if row.completion_time is not None:
+                total_completion_time += row.completion_time
+            priority_distribution[row.priority] = priority_distribution.get(row.priority, 0) + row.total
+            status_distribution[row.status] = status_distribution.get(row.status, 0) + row.total
+
+        avg_completion_time = (total_completion_time / completed_tasks if completed_tasks
+                               else timedelta())
+
+        statistics = {
             "total_tasks": total_tasks,
             "overdue_tasks": overdue_tasks,
-            "completed_tasks": len(completed_tasks),
+            "completed_tasks": completed_tasks,
             "average_completion_time_days": avg_completion_time.days,
             "priority_distribution": priority_distribution
         }
-    def export_tasks_to_csv(self, user_id: int) -> Tuple[pd.DataFrame, StringIO]:
+
+        return statistics, status_distribution
+
+    @response_cache.cached("statistics", version=task_version)
+    def get_task_statistics(self, user_id: int) -> Dict:
+
+        "Calculate various task statistics for a specific user"
+
+        statistics, _ = stats.read_statistics(self.db, user_id)
+        return statistics
+
+    def stream_tasks_csv(self, user_id: int, batch_size: int = 1000) -> Iterator[str]:
         """
-        Export tasks to CSV and return both DataFrame and CSV buffer
-        
+        Stream tasks as CSV chunks straight from a server-side cursor
+
         Args:
             user_id: The ID of the user whose tasks to export
-        
+            batch_size: Rows fetched from the cursor and written per chunk
+
+        Yields:
+            CSV text, starting with the header row
+        """
+        columns = [getattr(TaskDB, field) for field in Taskutils.LIST_FIELDS]
+        rows = self.db.query(*columns)\
+            .filter(TaskDB.owner_id == user_id)\
+            .order_by(TaskDB.task_id)\
+            .yield_per(batch_size)
+
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(Taskutils.LIST_FIELDS)
+
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+            if count % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+
+        yield buffer.getvalue()
+
+    EXPORT_MEDIA_TYPES = {
+        "parquet": "application/vnd.apache.parquet",
+        "arrow": "application/vnd.apache.arrow.stream",
+        "ndjson": "application/x-ndjson",
+    }
+
+    def export_tasks(self, fmt: str, user_id: Optional[int] = None,
+                     batch_size: int = 10000) -> Iterator[bytes]:
+        """
+        Export tasks in a bulk format, one batch at a time from a server-side cursor
+
+        Args:
+            fmt: One of "parquet", "arrow" (IPC stream) or "ndjson"
+            user_id: The ID of the user whose tasks to export, or None for all users
+            batch_size: Rows per record batch / Parquet row group
+
         Returns:
-            Tuple containing (DataFrame, StringIO buffer with CSV data)
+            Iterator over the encoded bytes, suitable for a StreamingResponse
         """
-        # Fetch all tasks
-        tasks = self.db.query(TaskDB).filter(TaskDB.owner_id == user_id).all()
+        if fmt not in self.EXPORT_MEDIA_TYPES:
+            raise ValueError(f"Unsupported export format: {fmt}")
 
-        # Convert tasks to DataFrame
-        task_data = [
-            {
-                "task_id": task.task_id,
-                "name": task.name,
-                "description": task.description,
-                "status": task.status,
-                "due_date": task.due_date,
-                "completed_date": task.completed_date,
-                "assigned_to": task.assigned_to,
-                "priority": task.priority,
-                "owner_id": task.owner_id
-            }
-            for task in tasks
-        ]
-        df = pd.DataFrame(task_data)
+        query = self.db.query(*[getattr(TaskDB, field) for field in Taskutils.LIST_FIELDS])
+        if user_id is not None:
+            query = query.filter(TaskDB.owner_id == user_id).order_by(TaskDB.owner_id, TaskDB.task_id)
+        else:
+            # Primary key order streams straight off the index, with no sort of the whole table
+            query = query.order_by(TaskDB.task_id)
+        rows = query.yield_per(batch_size)
 
-        # Create CSV buffer
-        buffer = StringIO()
-        df.to_csv(buffer, index=False)
-        buffer.seek(0)
-        
-        return df, buffer
+        if fmt == "ndjson":
+            return self._export_ndjson(rows)
+
+        # Imported lazily so workers that never export do not pay for pyarrow
+        import pyarrow as pa
 
+        schema = pa.schema([
+            ("task_id", pa.int64()),
+            ("name", pa.string()),
+            ("description", pa.string()),
+            ("status", pa.dictionary(pa.int32(), pa.string())),
+            ("due_date", pa.timestamp("us")),
+            ("completed_date", pa.timestamp("us")),
+            ("assigned_to", pa.string()),
+            ("priority", pa.dictionary(pa.int32(), pa.string())),
+            ("owner_id", pa.int64()),
+        ])
+
+        return self._export_arrow(rows, schema, fmt, batch_size)
+
+    @staticmethod
+    def _export_ndjson(rows) -> Iterator[bytes]:
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(
+                dict(zip(Taskutils.LIST_FIELDS, row)),
+                default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v)
+            ))
+            if len(lines) >= 1000:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+                lines = []
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+    @staticmethod
+    def _export_arrow(rows, schema, fmt: str, batch_size: int) -> Iterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        sink = _ChunkSink()
+        if fmt == "parquet":
+            writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+        else:
+            writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema)
+
+        def write(batch_rows):
+            columns = dict(zip(Taskutils.LIST_FIELDS, zip(*batch_rows)))
+            writer.write_batch(pa.RecordBatch.from_pydict(
+                {name: list(values) for name, values in columns.items()}, schema=schema
+            ))
+
+        batch_rows = []
+        for row in rows:
+            batch_rows.append(tuple(row))
+            if len(batch_rows) >= batch_size:
+                write(batch_rows)
+                batch_rows = []
+                yield sink.drain()
+
+        if batch_rows:
+            write(batch_rows)
+        writer.close()
+        yield sink.drain()
+
+    @response_cache.cached("report", version=task_version)
     def generate_task_report(self, user_id: int) -> Dict:
         """Generate detailed task analysis report for a specific user
         
@@ -171,19 +705,17 @@ class TaskAnalytics:
         
         # Tasks due this week
         week_end = current_date + timedelta(days=7)
-        upcoming_tasks = self.db.query(models.TaskDB).filter(
+        upcoming_tasks = self.db.query(
+            models.TaskDB.name,
+            models.TaskDB.due_date,
+            models.TaskDB.priority
+        ).filter(
             models.TaskDB.due_date.between(current_date, week_end),
             models.TaskDB.owner_id == user_id
         ).all()
 
-        # Tasks by status with user filtering
-        status_counts = dict(
-            self.db.query(
-                models.TaskDB.status,
-                func.count(models.TaskDB.task_id)
-            ).filter(models.TaskDB.owner_id == user_id)
-            .group_by(models.TaskDB.status).all()
-        )
+        # Statistics and status distribution come from the same counter read
+        statistics, status_counts = stats.read_statistics(self.db, user_id)
 
         return {
             "upcoming_tasks": [
@@ -194,136 +726,597 @@ class TaskAnalytics:
                 } for task in upcoming_tasks
             ],
             "status_distribution": status_counts,
-            "statistics": self.get_task_statistics(user_id)  # Pass user_id here
+            "statistics": statistics
         }
     
-    def generate_visualizations(self, user_id: int) -> BytesIO:
+    def generate_visualizations(self, user_id: int, fmt: str = "png") -> BytesIO:
         """
         Generate visualizations of task data
-        
+
         Args:
             user_id: The ID of the user whose tasks to visualize
-        
+            fmt: "png" (rendered with matplotlib) or "svg" (rendered directly)
+
         Returns:
-            BytesIO buffer containing the PNG image
+            BytesIO buffer containing the image
         """
-        # Get DataFrame directly without CSV conversion
-        df, _ = self.export_tasks_to_csv(user_id)
-
-        # Create visualization
-        priority_counts = df["priority"].value_counts()
-        plt.figure(figsize=(8, 6))
-        plt.pie(priority_counts.values, labels=priority_counts.index, autopct="%1.1f%%", startangle=90)
-        plt.title("Task Priority Distribution")
-        
-        # Save to buffer
-        buffer = BytesIO()
-        plt.savefig(buffer, format="png")
-        plt.close()  
-        buffer.seek(0)
-        
-        return buffer
-    
+        if fmt not in ("png", "svg"):
+            raise ValueError(f"Unsupported image format: {fmt}")
+
+        return BytesIO(self.priority_chart(user_id, fmt))
+
+    @response_cache.cached("visualization", version=task_version)
+    def priority_chart(self, user_id: int, fmt: str) -> bytes:
+
+        """Image bytes of the user's priority chart; cached per user, unlike the BytesIO."""
+
+        return self.render_priority_chart(self.priority_chart_counts(user_id), fmt)
+
+    def priority_chart_counts(self, user_id: int) -> Tuple[Tuple[str, int], ...]:
+
+        """The user's task count per priority, in chart order."""
+
+        # Sorted so that identical distributions share a render cache entry
+        return tuple(sorted(stats.priority_counts(self.db, user_id).items(),
+                            key=lambda item: (-item[1], str(item[0]))))
+
+    @staticmethod
+    def render_priority_chart(priority_counts: Tuple[Tuple[str, int], ...], fmt: str) -> bytes:
+        return _render_priority_chart(priority_counts, fmt)
+
+
+CHART_TITLE = "Task Priority Distribution"
+CHART_COLORS = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b")
+
+
+@lru_cache(maxsize=256)
+def _render_priority_chart(priority_counts: Tuple[Tuple[str, int], ...], fmt: str) -> bytes:
+
+    """Render a priority pie chart; results are cached by the counts themselves."""
+
+    if fmt == "svg":
+        return _render_priority_svg(priority_counts)
+
+    # Object-oriented API only: no pyplot global state, safe across threads
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    if priority_counts:
+        labels, values = zip(*priority_counts)
+        ax.pie(values, labels=[str(label) for label in labels], autopct="%1.1f%%", startangle=90)
+    else:
+        ax.text(0.5, 0.5, "No tasks", ha="center", va="center")
+        ax.set_axis_off()
+    ax.set_title(CHART_TITLE)
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def _render_priority_svg(priority_counts: Tuple[Tuple[str, int], ...]) -> bytes:
+
+    """Draw the priority pie chart as plain SVG, without matplotlib."""
+
+    width, height, radius = 640, 480, 180
+    cx, cy = width / 2, height / 2 + 20
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif">',
+        f'<text x="{cx}" y="36" text-anchor="middle" font-size="20">{CHART_TITLE}</text>',
+    ]
+
+    total = sum(count for _, count in priority_counts)
+    if not total:
+        parts.append(f'<text x="{cx}" y="{cy}" text-anchor="middle">No tasks</text>')
+
+    # Slices go counter-clockwise from twelve o'clock, like the matplotlib chart
+    angle = math.pi / 2
+    for index, (label, count) in enumerate(priority_counts):
+        if not total or not count:
+            continue
+        sweep = 2 * math.pi * count / total
+        color = CHART_COLORS[index % len(CHART_COLORS)]
+        if count == total:
+            parts.append(f'<circle cx="{cx}" cy="{cy}" r="{radius}" fill="{color}"/>')
+        else:
+            x1, y1 = cx + radius * math.cos(angle), cy - radius * math.sin(angle)
+            x2, y2 = cx + radius * math.cos(angle + sweep), cy - radius * math.sin(angle + sweep)
+            large_arc = 1 if sweep > math.pi else 0
+            parts.append(
+                f'<path d="M{cx:.2f},{cy:.2f} L{x1:.2f},{y1:.2f} '
+                f'A{radius},{radius} 0 {large_arc} 0 {x2:.2f},{y2:.2f} Z" fill="{color}"/>'
+            )
+        middle = angle + sweep / 2
+        lx, ly = cx + radius * 1.15 * math.cos(middle), cy - radius * 1.15 * math.sin(middle)
+        px, py = cx + radius * 0.6 * math.cos(middle), cy - radius * 0.6 * math.sin(middle)
+        anchor = "start" if math.cos(middle) >= 0 else "end"
+        parts.append(f'<text x="{lx:.2f}" y="{ly:.2f}" text-anchor="{anchor}">{escape(str(label))}</text>')
+        parts.append(f'<text x="{px:.2f}" y="{py:.2f}" text-anchor="middle">{100 * count / total:.1f}%</text>')
+        angle += sweep
+
+    parts.append("</svg>")
+    return "\n".join(parts).encode("utf-8")
+
+
+PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
+SCHEDULE_CAPACITY_PER_DAY = int(os.getenv("SCHEDULE_CAPACITY_PER_DAY", "3"))
+# Changes committed shortly before a run may carry an older updated_at, so
+# every incremental run re-reads this much history before its watermark
+SCHEDULE_WATERMARK_OVERLAP = timedelta(minutes=1)
+
+
 class TaskScheduler:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, capacity_per_day: int = SCHEDULE_CAPACITY_PER_DAY):
         self.db = db
+        self.capacity_per_day = capacity_per_day
 
-    def schedule_tasks(self) -> List[Dict]:
+    @staticmethod
+    def plan_assignee(tasks: List, start_date: date, capacity_per_day: int) -> List[Tuple]:
 
-        """Schedule tasks based on priority and due dates"""
+        """Plan one assignee's pending tasks onto days, at most `capacity_per_day` per day.
 
-        
-        pending_tasks = self.db.query(models.TaskDB).filter(
-            models.TaskDB.status == "pending"
-        ).order_by(
-            models.TaskDB.priority.desc(),
-            models.TaskDB.due_date.asc()
-        ).all()
+        Tasks come off a heap in (priority rank, due date, task id) order. Each
+        takes the first day with free capacity that is not earlier than its
+        priority allows (high: today, medium: +1 day, low: +2 days).
 
-        scheduled_tasks = []
-        current_date = datetime.now()
+        Returns:
+            List of (task, suggested start date) in planning order
+        """
 
-        for task in pending_tasks:
-            
-            if task.priority == "high":
-                start_date = current_date
-            elif task.priority == "medium":
-                start_date = current_date + timedelta(days=1)
-            else:
-                start_date = current_date + timedelta(days=2)
+        heap = [
+            (PRIORITY_RANK.get(task.priority, len(PRIORITY_RANK)),
+             task.due_date or datetime.max, task.task_id, task)
+            for task in tasks
+        ]
+        heapq.heapify(heap)
+
+        load = {}
+        first_open = {}
+        planned = []
+        while heap:
+            rank, _, _, task = heapq.heappop(heap)
+            day = first_open.get(rank, min(rank, 2))
+            while load.get(day, 0) >= capacity_per_day:
+                day += 1
+            load[day] = load.get(day, 0) + 1
+            first_open[rank] = day
+            planned.append((task, datetime.combine(start_date + timedelta(days=day), datetime.min.time())))
+
+        return planned
+
+    def replan(self, full: bool = False, assignees_per_batch: int = 500) -> Dict:
+
+        """Re-plan the assignees whose tasks changed since the last run.
+
+        An assignee is an (owner_id, assigned_to) pair. A full run re-plans every
+        assignee with pending tasks, e.g. once a day so that plans move forward
+        with the calendar. An incremental run also re-plans the assignees that
+        task deletes marked in task_schedule_dirty. Each batch of assignees is
+        planned from its pending tasks only, and its rows in task_schedule are
+        replaced in one commit.
+        Runs from all app processes are serialized by an advisory lock; a run
+        that finds it held is skipped, since the holder covers its changes or
+        the next run will.
+
+        Returns:
+            Dict with the number of assignees and tasks planned
+        """
+
+        with try_advisory_lock(self.db.get_bind(), "task_scheduler") as acquired:
+            if not acquired:
+                logger.info("Task schedule re-plan already running elsewhere, skipping")
+                return {"full": full, "skipped": True}
+            return self._replan(full, assignees_per_batch)
+
+    def _replan(self, full: bool, assignees_per_batch: int) -> Dict:
+        # Database time, so the watermark is comparable with tasks.updated_at
+        run_started = self.db.query(func.localtimestamp()).scalar()
+        last_run = self.db.query(models.SchedulerRun)\
+            .filter(models.SchedulerRun.finished_at.isnot(None))\
+            .order_by(models.SchedulerRun.id.desc()).first()
+        full = full or last_run is None
+
+        run = models.SchedulerRun(full=int(full), watermark=run_started)
+        self.db.add(run)
+        self.db.commit()
+
+        if full:
+            keys = self.db.query(models.TaskDB.owner_id, models.TaskDB.assigned_to)\
+                .filter(models.TaskDB.status == "pending").distinct().all()
+        else:
+            since = last_run.watermark - SCHEDULE_WATERMARK_OVERLAP
+            changed = self.db.query(models.TaskDB.task_id, models.TaskDB.owner_id,
+                                    models.TaskDB.assigned_to)\
+                .filter(models.TaskDB.updated_at > since).all()
+            changed_ids = [row.task_id for row in changed]
+            # Re-planning a task's previous assignee too drops it from that plan
+            # when it was reassigned or completed
+            previous = self.db.query(models.TaskSchedule.owner_id, models.TaskSchedule.assigned_to)\
+                .filter(models.TaskSchedule.task_id.in_(changed_ids)).all() if changed_ids else []
+            # Deleted tasks are gone from both tables; their deletes marked the assignees
+            deleted = self.db.query(models.ScheduleDirtyAssignee.owner_id,
+                                    models.ScheduleDirtyAssignee.assigned_to).all()
+            keys = list({(row.owner_id, row.assigned_to) for row in changed + previous + deleted})
+
+        today = run_started.date()
+        assignees = tasks = 0
+        for start in range(0, len(keys), assignees_per_batch):
+            batch = keys[start:start + assignees_per_batch]
+            owner_assignees = [(owner_id, assigned_to or models.DEFAULT_ASSIGNEE)
+                               for owner_id, assigned_to in batch]
+
+            pending = self.db.query(
+                models.TaskDB.task_id,
+                models.TaskDB.owner_id,
+                models.TaskDB.assigned_to,
+                models.TaskDB.name,
+                models.TaskDB.priority,
+                models.TaskDB.due_date
+            ).filter(
+                models.TaskDB.status == "pending",
+                tuple_(models.TaskDB.owner_id,
+                       func.coalesce(models.TaskDB.assigned_to, models.DEFAULT_ASSIGNEE)).in_(owner_assignees)
+            ).all()
+
+            by_assignee = {}
+            for task in pending:
+                by_assignee.setdefault((task.owner_id, task.assigned_to or models.DEFAULT_ASSIGNEE), []).append(task)
+
+            rows = []
+            for (owner_id, assigned_to), assignee_tasks in by_assignee.items():
+                for task, start_date in self.plan_assignee(assignee_tasks, today, self.capacity_per_day):
+                    rows.append({
+                        "task_id": task.task_id,
+                        "owner_id": owner_id,
+                        "assigned_to": assigned_to,
+                        "name": task.name,
+                        "priority": task.priority or models.DEFAULT_PRIORITY,
+                        "due_date": task.due_date,
+                        "suggested_start_date": start_date,
+                        "planned_at": run_started,
+                    })
 
-            scheduled_tasks.append({
-                "task_id": task.task_id,
-                "name": task.name,
-                "suggested_start_date": start_date.isoformat(),
-                "due_date": task.due_date.isoformat(),
-                "priority": task.priority
-            })
+            self.db.query(models.TaskSchedule).filter(
+                tuple_(models.TaskSchedule.owner_id, models.TaskSchedule.assigned_to).in_(owner_assignees)
+            ).delete(synchronize_session=False)
+            if rows:
+                self.db.execute(insert(models.TaskSchedule), rows)
+            # A new plan is new data for the owners, in every process's cache
+            replanned = {owner_id for owner_id, _ in owner_assignees}
+            versions.bump_many(self.db, replanned)
+            invalidate_on_commit(self.db, replanned)
+            self.db.commit()
+
+            assignees += len(batch)
+            tasks += len(rows)
+
+        # Assignees left without pending tasks are not in a full run's keys
+        if full:
+            emptied = self.db.execute(
+                delete(models.TaskSchedule.__table__).where(
+                    models.TaskSchedule.planned_at < run_started
+                ).returning(models.TaskSchedule.owner_id)
+            ).scalars().all()
+            versions.bump_many(self.db, emptied)
+            invalidate_on_commit(self.db, set(emptied))
+
+        # Marks from before the run are covered by it; the overlap keeps those
+        # of deletes that committed while it was reading
+        self.db.query(models.ScheduleDirtyAssignee).filter(
+            models.ScheduleDirtyAssignee.marked_at < run_started - SCHEDULE_WATERMARK_OVERLAP
+        ).delete(synchronize_session=False)
+
+        run.assignees_planned = assignees
+        run.tasks_planned = tasks
+        run.finished_at = func.now()
+        self.db.commit()
+
+        summary = {"full": full, "assignees_planned": assignees, "tasks_planned": tasks}
+        logger.info(f"Task schedule re-planned: {summary}")
+
+        return summary
+
+    @staticmethod
+    def mark_deleted_statement(owner_id: int, deleted: List[Dict]):
+
+        """Build the upsert that queues the assignees of deleted pending tasks
+        for the next re-plan, or None if no pending task was deleted."""
+
+        assignees = sorted({task.get("assigned_to") or models.DEFAULT_ASSIGNEE
+                            for task in deleted if task.get("status") == models.TaskStatus.pending.value})
+        if not assignees:
+            return None
+
+        stmt = pg_insert(models.ScheduleDirtyAssignee).values(
+            [{"owner_id": owner_id, "assigned_to": assigned_to} for assigned_to in assignees]
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=[models.ScheduleDirtyAssignee.owner_id, models.ScheduleDirtyAssignee.assigned_to],
+            set_={"marked_at": func.now()}
+        )
+
+    @response_cache.cached("schedule", version=task_version)
+    def schedule_tasks(self, owner_id: int, limit: int = 100,
+                       cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+
+        """Return one keyset page of the user's planned tasks, earliest start first"""
+
+        query = self.db.query(models.TaskSchedule)\
+            .filter(models.TaskSchedule.owner_id == owner_id)
+        if cursor is not None:
+            after_start, after_task_id = Taskutils.decode_cursor(cursor)
+            query = query.filter(
+                tuple_(models.TaskSchedule.suggested_start_date, models.TaskSchedule.task_id)
+                > tuple_(after_start, after_task_id)
+            )
+        rows = query.order_by(models.TaskSchedule.suggested_start_date,
+                              models.TaskSchedule.task_id).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = Taskutils.encode_cursor(rows[-1].suggested_start_date, rows[-1].task_id)
+
+        scheduled_tasks = [
+            {
+                "task_id": row.task_id,
+                "name": row.name,
+                "assigned_to": row.assigned_to,
+                "suggested_start_date": row.suggested_start_date.isoformat(),
+                "due_date": row.due_date.isoformat() if row.due_date else None,
+                "priority": row.priority
+            }
+            for row in rows
+        ]
+
+        return scheduled_tasks, next_cursor
+
+DIGEST_MAX_TASKS = int(os.getenv("DIGEST_MAX_TASKS", "50"))
+
+
+class DigestBuilder:
+
+    """Render notification lines and capped digest emails from templates.
+
+    Every line is rendered exactly once and the digest is joined once, so the
+    cost is linear in the number of tasks shown.
+    """
+
+    OVERDUE_TEMPLATE = Template("OVERDUE: Task '$name' was due $days days ago")
+    REMINDER_TEMPLATE = Template("REMINDER: Task '$name' is due in $days days")
+    DIGEST_TEMPLATE = Template("Task Details:\n\n$lines\n$more")
+    MORE_TEMPLATE = Template("\n...and $remaining more tasks. Call /ops/notify to see all of them.\n")
+
+    def __init__(self, current_date: datetime, max_tasks: int = DIGEST_MAX_TASKS):
+        self.current_date = current_date
+        self.max_tasks = max_tasks
+
+    def line(self, name: str, due_date: datetime) -> str:
+        days_until_due = (due_date - self.current_date).days
+        if days_until_due < 0:
+            return self.OVERDUE_TEMPLATE.substitute(name=name, days=abs(days_until_due))
+        return self.REMINDER_TEMPLATE.substitute(name=name, days=days_until_due)
+
+    def digest(self, lines: List[str], total: int) -> str:
+
+        """Render the digest from at most `max_tasks` lines out of `total` due tasks."""
+
+        shown = lines[:self.max_tasks]
+        remaining = total - len(shown)
+        return self.DIGEST_TEMPLATE.substitute(
+            lines="\n\n".join(shown) + "\n",
+            more=self.MORE_TEMPLATE.substitute(remaining=remaining) if remaining > 0 else ""
+        )
 
-        return scheduled_tasks
 
 class TaskNotifier:
+
+    NOTIFICATION_WINDOW = timedelta(days=2)
+
     def __init__(self, db: Session):
         self.db = db
-        self.smtp_config = {
-            'port': 587,
-            'smtp_server': "smtp.mailosaur.net",
-            'login': os.getenv("USERNAME"),
-            'password': os.getenv("PASSWORD"),
-            'sender_email': os.getenv("SENDER_MAIL")
-        }
 
-    def send_notifications(self, email) -> List[Dict]:
-        """Send notifications for upcoming and overdue tasks"""
+    def send_daily_digests(self, users_per_batch: int = 1000,
+                           fetch_size: int = 10000) -> Dict:
+        """Queue one digest email per user with pending tasks due soon
+
+        A single query over the pending tasks index, in owner order, is
+        streamed from a server-side cursor on its own connection. Rows are
+        grouped per owner and the digests are written to the outbox in batches,
+        with the recipients looked up by primary key once per batch; each batch
+        commits together with the run checkpoint, so a
+        crashed sweep resumes after the last committed owner without sending
+        duplicates. An advisory lock keeps concurrent sweeps from other app
+        processes out. Delivery fan-out is done by the outbox worker pool.
+
+        Returns:
+            Dict with the run's counters and per-phase timings in seconds
+        """
+        # Every app process schedules this job; only one sweep may run at a time
+        with try_advisory_lock(self.db.get_bind(), "daily_digests") as acquired:
+            if not acquired:
+                logger.info("Daily notification sweep already running elsewhere, skipping")
+                return {"status": "skipped"}
+            return self._sweep_daily_digests(users_per_batch, fetch_size)
 
-        self.smtp_config.update({'receiver_email' : email})
+    def _sweep_daily_digests(self, users_per_batch: int, fetch_size: int) -> Dict:
+        run_started = time.perf_counter()
         current_date = datetime.now()
-        notification_window = current_date + timedelta(days=2)
+        builder = DigestBuilder(current_date)
+
+        self.db.execute(
+            pg_insert(models.NotificationRun).values(run_date=date.today())
+            .on_conflict_do_nothing(index_elements=[models.NotificationRun.run_date])
+        )
+        self.db.commit()
+        run = self.db.query(models.NotificationRun)\
+            .filter(models.NotificationRun.run_date == date.today()).one()
+
+        if run.status == "completed":
+            logger.info(f"Daily notifications for {run.run_date} already sent")
+            return self._run_summary(run)
+
+        render_seconds = write_seconds = 0.0
+        users = tasks = 0
+        pending_digests = []
+        last_owner_id = run.last_owner_id
+
+        def flush():
+            nonlocal write_seconds, pending_digests
+            started = time.perf_counter()
+            recipients = self.digest_recipients([owner_id for owner_id, _ in pending_digests])
+            # Owners deleted since their tasks were read have no recipient
+            rows = [{"recipient": recipients[owner_id], "subject": "Task Notification", "body": body}
+                    for owner_id, body in pending_digests if owner_id in recipients]
+            if rows:
+                self.db.execute(insert(models.EmailOutbox), rows)
+            self.db.query(models.NotificationRun).filter(models.NotificationRun.id == run.id).update({
+                "last_owner_id": last_owner_id,
+                "users_notified": models.NotificationRun.users_notified + users,
+                "tasks_notified": models.NotificationRun.tasks_notified + tasks,
+            }, synchronize_session=False)
+            self.db.commit()
+            pending_digests = []
+            write_seconds += time.perf_counter() - started
+
+        query = self.daily_digest_query(current_date, run.last_owner_id)
+
+        engine = self.db.get_bind()
+        with engine.connect().execution_options(stream_results=True, yield_per=fetch_size) as conn:
+            rows = conn.execute(query)
+            for owner_id, owner_rows in groupby(rows, key=lambda row: row.owner_id):
+                started = time.perf_counter()
+                lines = []
+                owner_tasks = 0
+                for row in owner_rows:
+                    # Rows past the cap are only counted, never rendered
+                    if owner_tasks < builder.max_tasks:
+                        lines.append(builder.line(row.name, row.due_date))
+                    owner_tasks += 1
+                pending_digests.append((owner_id, builder.digest(lines, owner_tasks)))
+                render_seconds += time.perf_counter() - started
+
+                last_owner_id = owner_id
+                users += 1
+                tasks += owner_tasks
+                if len(pending_digests) >= users_per_batch:
+                    flush()
+                    users = tasks = 0
 
-        # Get tasks due soon
-        upcoming_tasks = self.db.query(models.TaskDB)\
-        .join(models.User,models.TaskDB.owner_id == models.User.id)\
-        .filter(
-            models.TaskDB.due_date <= notification_window,
+        flush()
+
+        total_seconds = time.perf_counter() - run_started
+        self.db.query(models.NotificationRun).filter(models.NotificationRun.id == run.id).update({
+            "status": "completed",
+            "finished_at": datetime.now(),
+            "render_seconds": models.NotificationRun.render_seconds + render_seconds,
+            "write_seconds": models.NotificationRun.write_seconds + write_seconds,
+            "query_seconds": models.NotificationRun.query_seconds
+                             + (total_seconds - render_seconds - write_seconds),
+        }, synchronize_session=False)
+        self.db.commit()
+
+        self.db.refresh(run)
+        summary = self._run_summary(run)
+        logger.info(f"Daily notification sweep finished: {summary}")
+
+        return summary
+
+    def daily_digest_query(self, current_date: datetime, after_owner_id: int):
+
+        """Pending tasks due within the notification window, for owners after
+        `after_owner_id`, ordered by owner."""
+
+        return select(
+            models.TaskDB.owner_id,
+            models.TaskDB.name,
+            models.TaskDB.due_date
+        ).where(
             models.TaskDB.status == "pending",
-            models.User.email == email
-        ).all()
+            models.TaskDB.due_date <= current_date + self.NOTIFICATION_WINDOW,
+            models.TaskDB.owner_id > after_owner_id
+        ).order_by(models.TaskDB.owner_id, models.TaskDB.due_date)
 
-        notifications = []
+    def digest_recipients(self, owner_ids: List[int]) -> Dict[int, str]:
 
-        message = ""
+        """Email address of each owner, by primary key."""
 
-        for task in upcoming_tasks:
-            days_until_due = (task.due_date - current_date).days
-            
-            message += "Task Details:\n\n"
-            if days_until_due < 0:
-                message += f"OVERDUE: Task '{task.name}' was due {abs(days_until_due)} days ago\n\n"
-            else:
-                message += f"REMINDER: Task '{task.name}' is due in {days_until_due} days\n\n"
+        if not owner_ids:
+            return {}
+
+        return dict(self.db.query(models.User.id, models.User.email).filter(
+            models.User.id == any_(literal(list(owner_ids), ARRAY(Integer)))
+        ).all())
 
-            notifications.append({
-                "task_id": task.task_id,
-                "message": message,
+    @staticmethod
+    def _run_summary(run) -> Dict:
+        return {
+            "run_date": run.run_date.isoformat(),
+            "status": run.status,
+            "users_notified": run.users_notified,
+            "tasks_notified": run.tasks_notified,
+            "query_seconds": run.query_seconds,
+            "render_seconds": run.render_seconds,
+            "write_seconds": run.write_seconds,
+        }
+
+    def send_notifications(self, owner_id: int, email: str, limit: int = 100,
+                           cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Queue notifications for upcoming and overdue tasks
+
+        Returns one keyset page of per-task notifications, each carrying only its
+        own line. The digest email is queued in the outbox once, with the first
+        page, and is capped at DIGEST_MAX_TASKS lines. Delivery is done by
+        mailer.OutboxWorker, so this returns as soon as the outbox row commits.
+
+        Returns:
+            Tuple containing (list of notifications, cursor for the next page or None)
+        """
+
+        current_date = datetime.now()
+        builder = DigestBuilder(current_date)
+
+        def due_tasks(*columns):
+            return self.db.query(*columns)\
+                .filter(
+                    models.TaskDB.owner_id == owner_id,
+                    models.TaskDB.due_date <= current_date + self.NOTIFICATION_WINDOW,
+                    models.TaskDB.status == "pending"
+                ).order_by(models.TaskDB.due_date, models.TaskDB.task_id)
+
+        page = due_tasks(models.TaskDB.task_id, models.TaskDB.name, models.TaskDB.due_date)
+        if cursor is not None:
+            after_due_date, after_task_id = Taskutils.decode_cursor(cursor)
+            page = page.filter(
+                tuple_(models.TaskDB.due_date, models.TaskDB.task_id) > tuple_(after_due_date, after_task_id)
+            )
+        rows = page.limit(limit + 1).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = Taskutils.encode_cursor(rows[-1].due_date, rows[-1].task_id)
+
+        notifications = [
+            {
+                "task_id": row.task_id,
+                "message": builder.line(row.name, row.due_date),
                 "sent_at": current_date.isoformat()
-            })
-        
-        if len(message) > 0:
-            self._send_email(message)
-
-        return notifications
-
-    def _send_email(self, content: str):
-        message = MIMEText(content, "plain")
-        message["Subject"] = "Task Notification"
-        message["From"] = self.smtp_config['sender_email']
-        message["To"] = self.smtp_config['receiver_email']
-
-        with smtplib.SMTP(self.smtp_config['smtp_server'], self.smtp_config['port']) as server:
-            server.starttls()
-            server.login(self.smtp_config['login'], self.smtp_config['password'])
-            server.sendmail(
-                self.smtp_config['sender_email'],
-                self.smtp_config['receiver_email'],
-                message.as_string()
-            )
\ No newline at end of file
+            }
+            for row in rows
+        ]
+
+        if cursor is None and rows:
+            digest_rows = due_tasks(
+                models.TaskDB.name,
+                models.TaskDB.due_date,
+                func.count().over().label("total")
+            ).limit(builder.max_tasks).all()
+            lines = [builder.line(row.name, row.due_date) for row in digest_rows]
+            enqueue_email(self.db, email, "Task Notification",
+                          builder.digest(lines, digest_rows[0].total))
+            self.db.commit()
+
+        return notifications, next_cursor
@@ -0,0 +1,35 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from models import TaskVersion
+
+
+def bump_statement(owner_ids):
+
+    """Build the upsert that advances the owners' task versions, or None for no owners."""
+
+    rows = [{"owner_id": owner_id, "version": 1} for owner_id in sorted(set(owner_ids))]
+    if not rows:
+        return None
+
+    stmt = insert(TaskVersion).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[TaskVersion.owner_id],
+        set_={"version": TaskVersion.version + 1}
+    )
+
+
+def bump_many(db: Session, owner_ids) -> None:
+
+    """Advance the owners' task versions inside the caller's transaction."""
+
+    stmt = bump_statement(owner_ids)
+    if stmt is not None:
+        db.execute(stmt)
+
+
+def current(db: Session, owner_id: int) -> int:
+
+    """Return the owner's task version; 0 until their first task write."""
+
+    version = db.query(TaskVersion.version).filter(TaskVersion.owner_id == owner_id).scalar()
+    return version or 0
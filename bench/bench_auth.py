@@ -0,0 +1,67 @@
+"""Authenticated requests per second with the principal cache on and off.
+
+Serves a minimal route that depends on get_current_user through FastAPI's
+TestClient and measures requests per second in three modes:
+
+- no cache: the principal cache is cleared before every request, so each
+  request looks the user up, as before the cache existed
+- cache: the principal cache answers after the first request
+- claims: the token carries the email, so no lookup is made at all
+
+Usage:
+    python bench/bench_auth.py [--requests 2000]
+"""
+import argparse
+import time
+
+from common import seeded_session, seed
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from database import engine, get_db
+import models
+import oauth2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+
+    app = FastAPI()
+
+    @app.get("/whoami")
+    def whoami(current_user = Depends(oauth2.get_current_user)):
+        return {"id": current_user.id}
+
+    with seeded_session(engine) as (conn, db):
+        user_id = seed(conn, 1, 0)[0]
+        user = db.get(models.User, user_id)
+
+        # Every request shares the benchmark's rolled-back session
+        app.dependency_overrides[get_db] = lambda: db
+        client = TestClient(app)
+
+        id_token = oauth2.create_access_token({"id": user.id})
+        claims_token = oauth2.create_access_token({"id": user.id, "email": user.email})
+
+        modes = {
+            "no cache": (id_token, True),
+            "cache": (id_token, False),
+            "claims in token": (claims_token, False),
+        }
+        for mode, (token, clear_cache) in modes.items():
+            headers = {"Authorization": f"Bearer {token}"}
+            oauth2.principal_cache.clear()
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                if clear_cache:
+                    oauth2.principal_cache.clear()
+                assert client.get("/whoami", headers=headers).status_code == 200
+            elapsed = time.perf_counter() - started
+            print(f"{mode:<20} {args.requests / elapsed:10.1f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Task write throughput: the single-row path vs the bulk endpoints' SQL.
+
+For one user, creates, updates and deletes `--items` tasks first one at a
+time, as POST/PATCH/DELETE /task/{id} do, then with Taskutils.bulk_create,
+bulk_update and bulk_delete, and reports tasks per second for each.
+
+Everything runs in a rolled-back transaction, so each single-row "commit"
+only releases a savepoint; against a real commit per request the gap is
+wider still.
+
+Usage:
+    python bench/bench_bulk_tasks.py [--items 5000]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from common import seeded_session, seed
+from database import engine
+from utils import Taskutils
+import models
+import stats
+
+
+def task_data(n):
+    return {"name": f"bulk task {n}", "priority": "high", "due_date": datetime.now() + timedelta(days=n % 30)}
+
+
+def create_one(db, owner_id, data):
+    # POST /task/, minus the HTTP layer
+    task = models.TaskDB(owner_id=owner_id, **Taskutils.normalize_task_data(data))
+    db.add(task)
+    db.flush()
+    Taskutils(db).record_change(owner_id, task.task_id, "task_created", None, stats.snapshot(task))
+    db.commit()
+    return task.task_id
+
+
+def throughput(label, items, call):
+    started = time.perf_counter()
+    call()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<24} {items / elapsed:10.1f} tasks/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+
+    with seeded_session(engine) as (conn, db):
+        owner_id = seed(conn, 1, 0)[0]
+        taskutils = Taskutils(db)
+        items = [task_data(n) for n in range(args.items)]
+
+        print("-- single-row")
+        task_ids = []
+        throughput("create", args.items,
+                   lambda: task_ids.extend(create_one(db, owner_id, data) for data in items))
+        throughput("update", args.items,
+                   lambda: [taskutils.update_task(task_id, owner_id, {"status": "completed"})
+                            for task_id in task_ids])
+        throughput("delete", args.items,
+                   lambda: [taskutils.delete_task(task_id, owner_id) for task_id in task_ids])
+
+        print("-- bulk")
+        created = []
+        throughput("bulk_create", args.items,
+                   lambda: created.extend(taskutils.bulk_create(owner_id, list(enumerate(items)))[0]))
+        task_ids = [result["task_id"] for result in created]
+        throughput("bulk_update", args.items,
+                   lambda: taskutils.bulk_update(owner_id, [(index, {"task_id": task_id, "status": "completed"})
+                                                            for index, task_id in enumerate(task_ids)]))
+        throughput("bulk_delete", args.items, lambda: taskutils.bulk_delete(owner_id, task_ids))
+
+
+if __name__ == "__main__":
+    main()
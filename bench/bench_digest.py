@@ -0,0 +1,62 @@
+"""Digest rendering and /ops/notify cost for a user with many due tasks.
+
+Seeds one user whose tasks are all pending and due within the notification
+window, then times DigestBuilder over every due task, the first and a later
+page of TaskNotifier.send_notifications, and reports the response size of a
+page. Per-task entries carry only their own line, so page size and latency
+should not grow with the number of due tasks.
+
+Usage:
+    python bench/bench_digest.py [--due-tasks 10000] [--limit 100]
+"""
+import argparse
+import json
+from datetime import datetime
+
+from common import seeded_session, seed, measure, report
+from sqlalchemy import text
+from database import engine
+from utils import DigestBuilder, TaskNotifier
+import models
+
+MAKE_DUE = text("""
+    UPDATE tasks
+    SET status = 'pending', completed_date = NULL,
+        due_date = NOW() + ((task_id % 4) - 2) * INTERVAL '1 day'
+    WHERE owner_id = :owner_id
+""")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--due-tasks", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+
+    with seeded_session(engine) as (conn, db):
+        user_id = seed(conn, 1, args.due_tasks)[0]
+        conn.execute(MAKE_DUE, {"owner_id": user_id})
+        conn.execute(text("ANALYZE tasks"))
+        email = conn.execute(text("SELECT email FROM users WHERE id = :id"), {"id": user_id}).scalar()
+        rows = conn.execute(text("SELECT name, due_date FROM tasks WHERE owner_id = :id"),
+                            {"id": user_id}).all()
+
+        builder = DigestBuilder(datetime.now())
+        report(f"render {len(rows)} lines + digest", measure(
+            lambda: builder.digest([builder.line(row.name, row.due_date) for row in rows], len(rows)),
+            args.repeat))
+
+        notifier = TaskNotifier(db)
+        page, cursor = notifier.send_notifications(user_id, email, limit=args.limit)
+        print(f"page of {len(page)}: {len(json.dumps(page, default=str))} bytes")
+        report("send_notifications first page", measure(
+            lambda: notifier.send_notifications(user_id, email, limit=args.limit), args.repeat))
+        report("send_notifications next page", measure(
+            lambda: notifier.send_notifications(user_id, email, limit=args.limit, cursor=cursor), args.repeat))
+
+
+if __name__ == "__main__":
+    main()
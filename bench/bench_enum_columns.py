@@ -0,0 +1,82 @@
+"""GROUP BY / ORDER BY cost and index size: native enums vs text columns.
+
+Seeds tasks, then copies (task_id, owner_id, status, priority) into two
+temporary tables, one keeping the task_status / task_priority enums and one
+casting them to text, each with the same (owner_id, status) and
+(owner_id, priority) indexes as tasks. Reports table and index sizes and
+times the aggregate and the priority ordering on both.
+
+Usage:
+    python bench/bench_enum_columns.py [--tasks 1000000] [--tasks-per-user 200]
+"""
+import argparse
+
+from common import seeded_session, seed, measure, report
+from sqlalchemy import text
+from database import engine
+import models
+
+VARIANTS = {
+    "enum": "status, priority",
+    "text": "status::text AS status, priority::text AS priority",
+}
+
+QUERIES = {
+    "GROUP BY status, priority": """
+        SELECT status, priority, count(*) FROM {table} GROUP BY status, priority
+    """,
+    "per-user GROUP BY status": """
+        SELECT status, count(*) FROM {table} WHERE owner_id = :owner_id GROUP BY status
+    """,
+    "per-user ORDER BY priority DESC": """
+        SELECT task_id FROM {table} WHERE owner_id = :owner_id
+        ORDER BY priority DESC, task_id LIMIT 50
+    """,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--tasks-per-user", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+
+    with seeded_session(engine) as (conn, db):
+        user_ids = seed(conn, args.tasks // args.tasks_per_user, args.tasks_per_user)
+        owner_id = user_ids[len(user_ids) // 2]
+
+        for variant, columns in VARIANTS.items():
+            table = f"bench_tasks_{variant}"
+            conn.execute(text(f"""
+                CREATE TEMP TABLE {table} ON COMMIT DROP AS
+                SELECT task_id, owner_id, {columns} FROM tasks WHERE owner_id >= :first_owner_id
+            """), {"first_owner_id": user_ids[0]})
+            conn.execute(text(f"CREATE INDEX {table}_status ON {table} (owner_id, status)"))
+            conn.execute(text(f"CREATE INDEX {table}_priority ON {table} (owner_id, priority)"))
+            conn.execute(text(f"ANALYZE {table}"))
+
+            sizes = conn.execute(text(f"""
+                SELECT pg_relation_size('{table}'), pg_relation_size('{table}_status'),
+                       pg_relation_size('{table}_priority')
+            """)).one()
+            print(f"-- {variant}: table {sizes[0] / 2**20:.1f} MiB, "
+                  f"(owner_id, status) index {sizes[1] / 2**20:.1f} MiB, "
+                  f"(owner_id, priority) index {sizes[2] / 2**20:.1f} MiB")
+
+            for label, sql in QUERIES.items():
+                query = text(sql.format(table=table))
+                report(label, measure(lambda: conn.execute(query, {"owner_id": owner_id}).all(),
+                                      args.repeat))
+
+            # Text sorts alphabetically, so "medium" > "low" > "high"
+            first = conn.execute(text(f"""
+                SELECT DISTINCT priority FROM {table} ORDER BY priority DESC LIMIT 1
+            """)).scalar()
+            print(f"highest priority by ORDER BY priority DESC: {first}")
+
+
+if __name__ == "__main__":
+    main()
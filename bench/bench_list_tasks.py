@@ -0,0 +1,49 @@
+"""GET /task/ latency as the tasks table grows.
+
+Grows the table in steps and, at each size, times Taskutils.list_tasks for
+one user: the first page, a page deep into the keyset, and a filtered page.
+With the read path a pure indexed SELECT, latency should stay flat while the
+table grows around that user.
+
+Usage:
+    python bench/bench_list_tasks.py [--sizes 10000,100000,1000000] [--tasks-per-user 500]
+"""
+import argparse
+
+from common import seeded_session, seed, measure, report
+from database import engine
+from utils import Taskutils
+import models
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--tasks-per-user", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+
+    with seeded_session(engine) as (conn, db):
+        user_id = seed(conn, 1, args.tasks_per_user)[0]
+        taskutils = Taskutils(db)
+        _, deep_cursor = taskutils.list_tasks(user_id, limit=args.tasks_per_user // 2)
+
+        seeded = args.tasks_per_user
+        next_user = 2
+        for size in (int(size) for size in args.sizes.split(",")):
+            users = max(0, (size - seeded) // args.tasks_per_user)
+            if users:
+                seed(conn, users, args.tasks_per_user, first_user=next_user)
+                next_user += users
+                seeded += users * args.tasks_per_user
+
+            print(f"-- {seeded} tasks")
+            report("first page", measure(lambda: taskutils.list_tasks(user_id), args.repeat))
+            report("deep page", measure(lambda: taskutils.list_tasks(user_id, cursor=deep_cursor), args.repeat))
+            report("status=pending", measure(lambda: taskutils.list_tasks(user_id, status="pending"), args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Email outbox delivery throughput against a local SMTP stand-in.
+
+Starts an aiosmtpd server that accepts and discards mail, queues `--emails`
+outbox rows and times OutboxWorker.drain_once until they are all sent, for
+each pooled concurrency level given.
+
+The outbox rows are committed, because the worker claims them from its own
+sessions, and deleted again afterwards. The worker claims any due email in
+the outbox, so run this against a test database only.
+
+Usage:
+    python bench/bench_outbox.py [--emails 2000] [--concurrency 1,4,16]
+"""
+import argparse
+import time
+
+from common import seeded_session  # noqa: F401  (puts app/ on the path)
+from aiosmtpd.controller import Controller
+from sqlalchemy import insert, delete
+from database import engine, SessionLocal
+from mailer import OutboxWorker, SMTP_CONFIG
+from models import EmailOutbox
+import models
+
+RECIPIENT_DOMAIN = "bench.invalid"
+
+
+class DiscardingHandler:
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+
+    handler = DiscardingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    config = dict(SMTP_CONFIG, smtp_server="127.0.0.1", port=args.port, starttls=False,
+                  login=None, password=None, sender_email=f"sender@{RECIPIENT_DOMAIN}")
+
+    try:
+        for concurrency in (int(level) for level in args.concurrency.split(",")):
+            with SessionLocal() as db:
+                db.execute(insert(EmailOutbox), [
+                    {"recipient": f"user{n}@{RECIPIENT_DOMAIN}", "subject": "Bench", "body": "x" * 500}
+                    for n in range(args.emails)
+                ])
+                db.commit()
+
+            worker = OutboxWorker(SessionLocal, config, concurrency)
+            received_before = handler.received
+            started = time.perf_counter()
+            while worker.drain_once():
+                pass
+            elapsed = time.perf_counter() - started
+            worker.stop()
+
+            sent = handler.received - received_before
+            print(f"concurrency={concurrency:<4} sent={sent:<6} {sent / elapsed:10.1f} emails/s")
+    finally:
+        controller.stop()
+        with SessionLocal() as db:
+            db.execute(delete(EmailOutbox).where(EmailOutbox.recipient.like(f"%@{RECIPIENT_DOMAIN}")))
+            db.commit()
+
+
+if __name__ == "__main__":
+    main()
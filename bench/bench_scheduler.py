@@ -0,0 +1,77 @@
+"""Task scheduler at scale: full and incremental re-plans, and a schedule page.
+
+Seeds `--tasks` pending tasks, times a full re-plan, touches `--touch` of
+them and times the incremental re-plan that follows, then times a page of
+/ops/schedule for one user. The incremental run only re-plans the touched
+tasks' assignees, so it should cost a small fraction of the full run.
+
+The whole run happens in one rolled-back transaction, where now() does not
+move, so the seeded tasks are back-dated past the scheduler's watermark
+overlap and the touched tasks are stamped with now().
+
+Usage:
+    python bench/bench_scheduler.py [--tasks 1000000] [--tasks-per-user 200] [--touch 0.01]
+"""
+import argparse
+import time
+
+from common import seeded_session, seed, measure, report
+from sqlalchemy import text
+from database import engine
+from utils import TaskScheduler
+import models
+
+MAKE_PENDING = text("""
+    UPDATE tasks
+    SET status = 'pending', completed_date = NULL, updated_at = NOW() - INTERVAL '1 hour'
+    WHERE owner_id >= :first_owner_id
+""")
+
+TOUCH = text("""
+    UPDATE tasks
+    SET priority = 'high', updated_at = NOW()
+    WHERE owner_id >= :first_owner_id AND random() < :fraction
+""")
+
+
+def timed(label, call):
+    started = time.perf_counter()
+    result = call()
+    print(f"{label:<40} {time.perf_counter() - started:9.3f}s  {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--tasks-per-user", type=int, default=200)
+    parser.add_argument("--touch", type=float, default=0.01)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+
+    with seeded_session(engine) as (conn, db):
+        user_ids = seed(conn, args.tasks // args.tasks_per_user, args.tasks_per_user)
+        conn.execute(MAKE_PENDING, {"first_owner_id": user_ids[0]})
+        conn.execute(text("ANALYZE tasks"))
+
+        # The inner _replan, since the advisory lock needs a connection of its own
+        scheduler = TaskScheduler(db)
+        timed("full re-plan", lambda: scheduler._replan(True, args.batch))
+
+        touched = conn.execute(TOUCH, {"first_owner_id": user_ids[0], "fraction": args.touch}).rowcount
+        print(f"touched {touched} tasks")
+        timed("incremental re-plan", lambda: scheduler._replan(False, args.batch))
+
+        # Time the query itself, not the response cache in front of it
+        schedule_page = TaskScheduler.schedule_tasks.__wrapped__
+        user_id = user_ids[len(user_ids) // 2]
+        _, cursor = schedule_page(scheduler, user_id, limit=50)
+        report("schedule first page", measure(lambda: schedule_page(scheduler, user_id), args.repeat))
+        report("schedule next page", measure(lambda: schedule_page(scheduler, user_id, cursor=cursor),
+                                             args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Serialization cost of a task list response, per `--items` tasks.
+
+Builds task rows the way Taskutils.list_tasks returns them and times each
+way the list routes can turn them into a JSON body: the old per-object
+TaskModel validation, FastAPI's response_model path (validate, then
+jsonable_encoder and json.dumps), a compiled pydantic TypeAdapter, and the
+FAST_JSON_RESPONSES path that hands the rows straight to orjson. Needs no
+database.
+
+Usage:
+    python bench/bench_serialization.py [--items 10000]
+"""
+import argparse
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+from common import measure, report
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from schemas import TaskModel, TaskPage
+
+
+def task_rows(count):
+    now = datetime.now()
+    return [
+        {
+            "task_id": n,
+            "name": f"task {n}",
+            "description": "No description",
+            "status": ("pending", "in_progress", "completed")[n % 3],
+            "due_date": now + timedelta(days=n % 30),
+            "completed_date": now if n % 3 == 2 else None,
+            "assigned_to": f"assignee {n % 5}",
+            "priority": ("low", "medium", "high")[n % 3],
+            "owner_id": 1,
+        }
+        for n in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = task_rows(args.items)
+    objects = [SimpleNamespace(**row) for row in rows]
+    page = {"items": rows, "next_cursor": None}
+    page_adapter = TypeAdapter(TaskPage)
+    tasks_adapter = TypeAdapter(List[TaskModel])
+
+    print(f"-- {args.items} tasks, milliseconds per response")
+    report("TaskModel per ORM object + json", measure(
+        lambda: json.dumps(jsonable_encoder([TaskModel.model_validate(obj) for obj in objects])),
+        args.repeat))
+    report("response_model=TaskPage + json", measure(
+        lambda: json.dumps(jsonable_encoder(page_adapter.validate_python(page))), args.repeat))
+    report("TypeAdapter(List[TaskModel])", measure(
+        lambda: tasks_adapter.dump_json(tasks_adapter.validate_python(rows)), args.repeat))
+    report("TypeAdapter(TaskPage)", measure(
+        lambda: page_adapter.dump_json(page_adapter.validate_python(page)), args.repeat))
+    report("orjson (FAST_JSON_RESPONSES)", measure(lambda: orjson.dumps(page), args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+The scripts import the app modules directly and need the same environment
+as the app (SQLALCHMEY_DATABASE_URL etc.). Seed data is written inside a
+transaction that is rolled back at the end, unless a script says otherwise.
+"""
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+SEED_USERS = text("""
+    INSERT INTO users (email, password)
+    SELECT 'bench-seed-' || g || '@example.com', '\\x00'::bytea
+    FROM generate_series(:first, :last) AS g
+""")
+
+SEED_TASKS = text("""
+    INSERT INTO tasks (name, status, due_date, completed_date, priority, assigned_to, owner_id)
+    SELECT 'task ' || g,
+           (ARRAY['pending', 'in_progress', 'completed'])[1 + g % 3]::task_status,
+           NOW() + (g % 30 - 10) * INTERVAL '1 day',
+           CASE WHEN g % 3 = 2 THEN NOW() - (g % 5) * INTERVAL '1 day' END,
+           (ARRAY['low', 'medium', 'high'])[1 + g % 3]::task_priority,
+           'assignee ' || (g % 5),
+           u.id
+    FROM users u
+    CROSS JOIN generate_series(1, :tasks_per_user) AS g
+    WHERE u.email LIKE 'bench-seed-%' AND u.id > :after_user_id
+""")
+
+
+@contextmanager
+def seeded_session(engine):
+
+    """Yield (connection, session) inside a transaction that is rolled back afterwards."""
+
+    with engine.connect() as conn:
+        trans = conn.begin()
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            yield conn, db
+        finally:
+            db.close()
+            trans.rollback()
+
+
+def seed(conn, users: int, tasks_per_user: int, first_user: int = 1) -> List[int]:
+
+    """Insert `users` users with `tasks_per_user` tasks each; return the new user ids."""
+
+    after_user_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM users")).scalar()
+    conn.execute(SEED_USERS, {"first": first_user, "last": first_user + users - 1})
+    conn.execute(SEED_TASKS, {"tasks_per_user": tasks_per_user, "after_user_id": after_user_id})
+    conn.execute(text("ANALYZE users"))
+    conn.execute(text("ANALYZE tasks"))
+    return list(conn.execute(text("SELECT id FROM users WHERE id > :after ORDER BY id"),
+                             {"after": after_user_id}).scalars())
+
+
+def measure(call: Callable, repeat: int) -> Dict[str, float]:
+
+    """Run `call` `repeat` times; return latency percentiles in milliseconds."""
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p99": timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+        "mean": statistics.fmean(timings),
+    }
+
+
+def report(label: str, result: Dict[str, float]):
+    print(f"{label:<40} " + "  ".join(f"{name}={value:9.3f}" for name, value in result.items()))
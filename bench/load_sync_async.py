@@ -0,0 +1,65 @@
+"""Throughput and p99 latency of a running API, for comparing sync and async mode.
+
+Start the app twice, once as is and once with ASYNC_DB=true, e.g.
+
+    cd app && uvicorn main:app --port 8000
+    cd app && ASYNC_DB=true uvicorn main:app --port 8001
+
+and run this script against each with a valid bearer token:
+
+    python bench/load_sync_async.py --url http://localhost:8000 --token $TOKEN
+    python bench/load_sync_async.py --url http://localhost:8001 --token $TOKEN
+
+Requests go out from `--concurrency` concurrent clients; only the task
+routes have async versions, so the default path is the task listing.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def run(url: str, path: str, token: str, concurrency: int, requests: int):
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def client_loop(client):
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{url}{path}  concurrency={concurrency}  requests={requests}  errors={errors}")
+    print(f"throughput {requests / elapsed:10.1f} requests/s")
+    print(f"p50 {statistics.median(latencies):9.2f} ms   "
+          f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--path", default="/task/?limit=20")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.url, args.path, args.token, args.concurrency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Fixtures for tests that run against a PostgreSQL database.
+
+Set TEST_DATABASE_URL to a database the tests may create tables in. Each
+test runs inside a transaction that is rolled back afterwards.
+"""
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+sys.path.insert(0, APP_DIR)
+
+if os.getenv("TEST_DATABASE_URL"):
+    os.environ["SQLALCHMEY_DATABASE_URL"] = os.environ["TEST_DATABASE_URL"]
+
+
+@pytest.fixture
+def connection():
+    from database import engine
+    import models
+
+    with engine.connect() as conn:
+        trans = conn.begin()
+        models.Base.metadata.create_all(bind=conn)
+        try:
+            yield conn
+        finally:
+            trans.rollback()
+
+
+@pytest.fixture
+def db(connection):
+    from sqlalchemy.orm import Session
+
+    # Commits inside the code under test only release savepoints
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def owner_id(db):
+    import models
+
+    user = models.User(email="owner@example.com", password=b"\x00")
+    db.add(user)
+    db.flush()
+    return user.id
+
+
+@pytest.fixture
+def count_statements(connection):
+
+    """Return a context manager that collects the SQL statements sent inside it,
+    leaving out savepoint bookkeeping."""
+
+    from contextlib import contextmanager
+    from sqlalchemy import event
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if not statement.lstrip().upper().startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")):
+                statements.append(statement)
+
+        event.listen(connection, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+    return counter
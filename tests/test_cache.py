@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("dotenv")
+
+from sqlalchemy.orm import Session
+
+import cache
+from cache import MemoryBackend, RedisBackend, ResponseCache
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    if request.param == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        return RedisBackend(client=fakeredis.FakeRedis())
+    return MemoryBackend(maxsize=100, ttl=60)
+
+
+@pytest.fixture
+def response_cache(backend, monkeypatch):
+    # The commit hooks invalidate through the module-level cache
+    response_cache = ResponseCache(backend, ttl=60)
+    monkeypatch.setattr(cache, "response_cache", response_cache)
+    return response_cache
+
+
+class Counter:
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"calls": self.calls}
+
+
+def test_hit_after_miss(response_cache):
+    compute = Counter()
+    assert response_cache.get_or_compute("stats", 1, (), compute) == {"calls": 1}
+    assert response_cache.get_or_compute("stats", 1, (), compute) == {"calls": 1}
+    assert response_cache.get_or_compute("stats", 2, (), compute) == {"calls": 2}
+    assert compute.calls == 2
+
+
+def test_new_version_misses(response_cache):
+    compute = Counter()
+    response_cache.get_or_compute("stats", 1, (), compute, version=lambda: 1)
+    assert response_cache.get_or_compute("stats", 1, (), compute, version=lambda: 2) == {"calls": 2}
+
+
+def test_invalidated_after_commit_only(response_cache):
+    compute = Counter()
+    response_cache.get_or_compute("stats", 1, (), compute)
+
+    db = Session()
+    cache.invalidate_on_commit(db, [1])
+    db.rollback()
+    assert response_cache.get_or_compute("stats", 1, (), compute) == {"calls": 1}
+
+    cache.invalidate_on_commit(db, [1])
+    db.commit()
+    assert response_cache.get_or_compute("stats", 1, (), compute) == {"calls": 2}
+
+
+def test_concurrent_misses_compute_once(response_cache):
+    compute = Counter()
+
+    def slow_compute():
+        time.sleep(0.2)
+        return compute()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            response_cache.get_or_compute("stats", 1, (), slow_compute)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert compute.calls == 1
+    assert results == [{"calls": 1}] * 8
+
+
+def test_async_concurrent_misses_compute_once(response_cache):
+    compute = Counter()
+
+    async def slow_compute():
+        # Yields to the loop like a query on an AsyncSession
+        await asyncio.sleep(0.2)
+        return compute()
+
+    async def run():
+        return await asyncio.gather(*[
+            response_cache.get_or_compute_async("stats", 1, (), slow_compute) for _ in range(8)
+        ])
+
+    results = asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+    assert compute.calls == 1
+    assert results == [{"calls": 1}] * 8
+
+
+def test_async_shares_entries_with_sync(response_cache):
+    compute = Counter()
+    response_cache.get_or_compute("stats", 1, ((), ()), compute, version=lambda: 3)
+
+    async def version():
+        return 3
+
+    async def async_compute():
+        return compute()
+
+    assert asyncio.run(response_cache.get_or_compute_async(
+        "stats", 1, ((), ()), async_compute, version=version)) == {"calls": 1}
+
+
+def test_memory_generations_stay_bounded():
+    backend = MemoryBackend(maxsize=10, ttl=60)
+    response_cache = ResponseCache(backend, ttl=60)
+    compute = Counter()
+    response_cache.get_or_compute("stats", 0, (), compute)
+
+    for user_id in range(1000):
+        response_cache.invalidate(user_id)
+    assert len(backend._generations) <= 10
+
+    # User 0's generation was evicted; its old entry must not come back
+    assert response_cache.get_or_compute("stats", 0, (), compute) == {"calls": 2}
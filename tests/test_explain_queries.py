@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+if not os.getenv("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+import explain_queries
+
+
+def test_queries_use_indexes(connection):
+    results = explain_queries.check(connection)
+
+    assert results
+    assert [(name, statement) for name, statement, seq_scans in results if seq_scans] == []
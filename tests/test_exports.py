@@ -0,0 +1,45 @@
+import os
+import resource
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+if not os.getenv("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy import text
+from utils import TaskAnalytics
+
+EXPORT_ROWS = int(os.getenv("EXPORT_TEST_ROWS", "1000000"))
+# Streaming keeps one batch in memory; buffering 1M rows takes hundreds of MB
+MEMORY_LIMIT_BYTES = 64 * 1024 * 1024
+
+
+def seed_tasks(connection, owner_id: int, rows: int):
+    connection.execute(text("""
+        INSERT INTO tasks (name, status, due_date, priority, owner_id)
+        SELECT 'task ' || g, 'pending', NOW() + g * INTERVAL '1 minute', 'medium', :owner_id
+        FROM generate_series(1, :rows) AS g
+    """), {"owner_id": owner_id, "rows": rows})
+
+
+def test_csv_export_memory_is_bounded(db, connection, owner_id):
+    seed_tasks(connection, owner_id, EXPORT_ROWS)
+
+    # tracemalloc sees Python objects; max RSS also sees rows buffered by libpq
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    tracemalloc.start()
+    try:
+        lines = 0
+        for chunk in TaskAnalytics(db).stream_tasks_csv(owner_id, batch_size=1000):
+            lines += chunk.count("\n")
+        _, python_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - rss_before
+
+    assert lines == EXPORT_ROWS + 1
+    assert python_peak < MEMORY_LIMIT_BYTES, python_peak
+    assert rss_growth < MEMORY_LIMIT_BYTES, rss_growth
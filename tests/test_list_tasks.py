@@ -0,0 +1,37 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+if not os.getenv("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy import insert
+
+import models
+from utils import Taskutils
+
+
+def test_pages_reach_tasks_without_due_date(db, owner_id):
+    now = datetime.now()
+    rows = [{"name": f"dated {n}", "due_date": now + timedelta(days=n), "owner_id": owner_id}
+            for n in range(5)]
+    rows += [{"name": f"undated {n}", "due_date": None, "owner_id": owner_id} for n in range(5)]
+    db.execute(insert(models.TaskDB.__table__), rows)
+
+    taskutils = Taskutils(db)
+    names = []
+    cursor = None
+    while True:
+        page, cursor = taskutils.list_tasks(owner_id, limit=3, cursor=cursor, fields=["name"])
+        names += [item["name"] for item in page]
+        if cursor is None:
+            break
+
+    assert names == [f"dated {n}" for n in range(5)] + [f"undated {n}" for n in range(5)]
+
+
+def test_cursor_round_trips_null_due_date():
+    assert Taskutils.decode_cursor(Taskutils.encode_cursor(None, 42)) == (None, 42)
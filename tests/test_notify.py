@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pusher = pytest.importorskip("pusher")
+pytest.importorskip("dotenv")
+
+# notify builds its module-level client from these at import time
+for name, value in (("PUSHER_APP_ID", "1"), ("PUSHER_KEY", "key"), ("PUSHER_SECRET", "secret")):
+    os.environ.setdefault(name, value)
+
+import metrics
+from notify import PusherPublisher
+
+
+class FakePusherHandler(BaseHTTPRequestHandler):
+
+    """Records the event batches posted to it and answers with server.status."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, body))
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_pusher():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakePusherHandler)
+    server.requests = []
+    server.status = 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def publisher(fake_pusher):
+    client = pusher.Pusher(app_id="1", key="key", secret="secret",
+                           host="127.0.0.1", port=fake_pusher.server_port, ssl=False)
+    publisher = PusherPublisher(client, linger=0.2)
+    yield publisher
+    publisher.stop()
+
+
+def sent_events(fake_pusher):
+    return [event for _, body in fake_pusher.requests for event in body["batch"]]
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_events_are_sent_in_batches_of_ten(fake_pusher, publisher):
+    for n in range(25):
+        publisher.publish(f"user{n}@example.com", "fetch-tasks", {"n": n})
+    publisher.start()
+    publisher.stop()
+
+    assert all(path.split("?")[0] == "/apps/1/batch_events" for path, _ in fake_pusher.requests)
+    assert [len(body["batch"]) for _, body in fake_pusher.requests] == [10, 10, 5]
+    assert {event["channel"] for event in sent_events(fake_pusher)} == {f"user{n}@example.com" for n in range(25)}
+
+
+def test_repeated_events_coalesce_to_the_latest(fake_pusher, publisher):
+    for n in range(5):
+        publisher.publish("user@example.com", "fetch-tasks", {"n": n})
+    publisher.publish("user@example.com", "task-updated", {"n": 0})
+    publisher.start()
+    publisher.stop()
+
+    events = sent_events(fake_pusher)
+    assert [(event["name"], json.loads(event["data"])) for event in events] == [
+        ("fetch-tasks", {"n": 4}),
+        ("task-updated", {"n": 0}),
+    ]
+
+
+def test_failed_batch_is_counted_and_the_worker_keeps_going(fake_pusher, publisher):
+    errors = metrics.counter("pusher_errors").value
+    fake_pusher.status = 500
+    publisher.start()
+    publisher.publish("user@example.com", "fetch-tasks", {"n": 0})
+    wait_for(lambda: len(fake_pusher.requests) == 1)
+    wait_for(lambda: metrics.counter("pusher_errors").value == errors + 1)
+
+    fake_pusher.status = 200
+    publisher.publish("user@example.com", "fetch-tasks", {"n": 1})
+    publisher.stop()
+
+    assert len(fake_pusher.requests) == 2
+    assert metrics.counter("pusher_errors").value == errors + 1
+
+
+def test_publish_after_stop_is_dropped(fake_pusher, publisher):
+    dropped = metrics.counter("pusher_events_dropped").value
+    publisher.start()
+    publisher.stop()
+    publisher.publish("user@example.com", "fetch-tasks", {"n": 0})
+
+    assert publisher._thread is None
+    assert metrics.counter("pusher_events_dropped").value == dropped + 1
+    assert fake_pusher.requests == []
@@ -0,0 +1,43 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+if not os.getenv("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+from sqlalchemy import text
+
+import models
+from utils import Taskutils, TaskScheduler
+
+
+def start_dates(db, owner_id):
+    return {row.task_id: row.suggested_start_date
+            for row in db.query(models.TaskSchedule).filter(models.TaskSchedule.owner_id == owner_id)}
+
+
+def test_incremental_replan_after_delete(db, owner_id):
+    results, _ = Taskutils(db).bulk_create(owner_id, [
+        (n, {"name": f"task {n}", "status": "pending", "priority": "high", "assigned_to": "alice",
+             "due_date": datetime.now() + timedelta(days=n + 1)})
+        for n in range(2)
+    ])
+    first, second = [result["task_id"] for result in results]
+
+    scheduler = TaskScheduler(db, capacity_per_day=1)
+    scheduler._replan(True, 500)
+    planned = start_dates(db, owner_id)
+    assert planned[second] == planned[first] + timedelta(days=1)
+
+    # Everything here runs at one transaction timestamp, so move the tasks'
+    # changes out of the next run's watermark window
+    db.execute(text("UPDATE tasks SET updated_at = now() - INTERVAL '1 hour' WHERE owner_id = :owner_id"),
+               {"owner_id": owner_id})
+
+    Taskutils(db).delete_task(first, owner_id)
+    scheduler._replan(False, 500)
+
+    assert start_dates(db, owner_id) == {second: planned[first]}
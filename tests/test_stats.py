@@ -0,0 +1,77 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+if not os.getenv("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+import models
+import stats
+from utils import Taskutils, TaskAnalytics
+
+
+def create_task(db, owner_id, **columns):
+    task = models.TaskDB(owner_id=owner_id, **Taskutils.normalize_task_data(columns))
+    db.add(task)
+    db.flush()
+    Taskutils(db).record_change(owner_id, task.task_id, "task_created", None, stats.snapshot(task))
+    db.commit()
+    return task.task_id
+
+
+def assert_counters_match(db, owner_id):
+    assert stats.read_statistics(db, owner_id) == TaskAnalytics(db)._aggregate_tasks(owner_id)
+
+
+def test_counters_follow_every_write_path(db, owner_id):
+    now = datetime.now()
+    taskutils = Taskutils(db)
+
+    ids = [
+        create_task(db, owner_id, name=f"task {n}", status=status, priority=priority,
+                    due_date=now + timedelta(days=days))
+        for n, (status, priority, days) in enumerate([
+            ("pending", "high", -2),
+            ("pending", "low", 3),
+            ("in_progress", "medium", -1),
+            ("completed", "high", -5),
+            ("pending", None, 1),
+        ])
+    ]
+    assert_counters_match(db, owner_id)
+
+    taskutils.update_task_status(ids[0], owner_id, "completed")
+    taskutils.update_due_date(ids[1], owner_id, now - timedelta(days=1))
+    taskutils.update_task(ids[2], owner_id, {"status": "pending", "priority": "low"})
+    assert_counters_match(db, owner_id)
+
+    taskutils.delete_task(ids[3], owner_id)
+    assert_counters_match(db, owner_id)
+
+    results, committed = taskutils.bulk_create(owner_id, [
+        (0, {"name": "bulk a", "status": "pending", "due_date": now - timedelta(days=3)}),
+        (1, {"name": "bulk b", "status": "completed", "due_date": now + timedelta(days=2)}),
+    ])
+    assert committed
+    taskutils.bulk_update(owner_id, [
+        (0, {"task_id": results[0]["task_id"], "status": "completed"}),
+        (1, {"task_id": ids[4], "priority": "high"}),
+    ])
+    taskutils.bulk_delete(owner_id, [results[1]["task_id"]])
+    assert_counters_match(db, owner_id)
+
+
+def test_reconcile_rebuilds_the_same_counters(db, owner_id):
+    now = datetime.now()
+    for n in range(6):
+        create_task(db, owner_id, name=f"task {n}", status=("pending", "completed")[n % 2],
+                    priority=("low", "medium", "high")[n % 3], due_date=now + timedelta(days=n - 3))
+    before = stats.read_statistics(db, owner_id)
+
+    stats.reconcile(db, owner_id=owner_id)
+
+    assert stats.read_statistics(db, owner_id) == before
+    assert_counters_match(db, owner_id)
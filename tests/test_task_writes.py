@@ -0,0 +1,99 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("psycopg2")
+if not os.getenv("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+import events
+import models
+import stats
+from utils import Taskutils, TaskAnalytics
+
+
+@pytest.fixture
+def task_id(db, owner_id):
+    task = models.TaskDB(name="write me", status="pending", priority="high",
+                         due_date=datetime.now() + timedelta(days=1), owner_id=owner_id)
+    db.add(task)
+    db.flush()
+    Taskutils(db).record_change(owner_id, task.task_id, "task_created", None, stats.snapshot(task))
+    db.commit()
+    return task.task_id
+
+
+def test_update_status_statement_count(db, owner_id, task_id, count_statements, monkeypatch):
+    # The memory event backend queues events in the session instead of a NOTIFY
+    monkeypatch.setattr(events, "TASK_EVENTS_BACKEND", "memory")
+
+    with count_statements() as statements:
+        task = Taskutils(db).update_task_status(task_id, owner_id, "completed")
+
+    # UPDATE ... RETURNING, then the task_versions upsert carrying the task_stats upsert
+    assert len(statements) == 2, statements
+    assert "task_stats" in statements[1] and "task_versions" in statements[1]
+    assert statements[0].lstrip().startswith("UPDATE tasks")
+    assert task.status == "completed"
+    assert task.completed_date is not None
+
+
+def test_update_due_date_without_counter_change(db, owner_id, task_id, count_statements, monkeypatch):
+    monkeypatch.setattr(events, "TASK_EVENTS_BACKEND", "memory")
+    due_date = datetime.now() + timedelta(days=3)
+
+    with count_statements() as statements:
+        task = Taskutils(db).update_due_date(task_id, owner_id, due_date)
+
+    # A pending task's due date does not move any counter, so no task_stats CTE
+    assert len(statements) == 2, statements
+    assert "task_stats" not in statements[1]
+    assert task.due_date == due_date
+
+
+def test_update_missing_task(db, owner_id, count_statements):
+    with count_statements() as statements:
+        assert Taskutils(db).update_task_status(-1, owner_id, "completed") is None
+
+    assert len(statements) == 1, statements
+
+
+def test_bulk_update_sets_completed_date(db, owner_id, task_id):
+    results, committed = Taskutils(db).bulk_update(
+        owner_id, [(0, {"task_id": task_id, "status": "completed"})]
+    )
+
+    assert committed and "error" not in results[0]
+    task = db.get(models.TaskDB, task_id, populate_existing=True)
+    assert task.completed_date is not None
+
+    # The counters see the task as completed, like a direct aggregate does
+    assert stats.read_statistics(db, owner_id) == TaskAnalytics(db)._aggregate_tasks(owner_id)
+
+
+def test_bulk_write_statement_counts(db, owner_id, count_statements, monkeypatch):
+    monkeypatch.setattr(events, "TASK_EVENTS_BACKEND", "memory")
+    taskutils = Taskutils(db)
+    items = [(n, {"name": f"bulk {n}", "status": "pending",
+                  "due_date": datetime.now() + timedelta(days=n)}) for n in range(3)]
+
+    # INSERT ... RETURNING, then the version bump carrying the counter upsert
+    with count_statements() as statements:
+        results, _ = taskutils.bulk_create(owner_id, items)
+    assert len(statements) == 2, statements
+    task_ids = [result["task_id"] for result in results]
+
+    # SELECT ... FOR UPDATE, UPDATE ... FROM (VALUES ...), version bump with counters
+    with count_statements() as statements:
+        taskutils.bulk_update(owner_id, [(n, {"task_id": task_id, "status": "completed"})
+                                         for n, task_id in enumerate(task_ids)])
+    assert len(statements) == 3, statements
+
+    # DELETE ... RETURNING, version bump with counters
+    with count_statements() as statements:
+        taskutils.bulk_delete(owner_id, task_ids)
+    assert len(statements) == 2, statements
+
+    assert stats.read_statistics(db, owner_id) == TaskAnalytics(db)._aggregate_tasks(owner_id)